@@ -0,0 +1,384 @@
+import pandas as pd
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+# --- INTERFACE DE ARMAZENAMENTO ---
+# O app só conversa com estes métodos; o backend (Google ou SQLite) é escolhido pela configuração.
+# Atividades da Agenda são identificadas pela coluna ID.
+
+COLUNA_ID = "ID"
+COLUNAS_DATA = ("Data Início", "Data Fim")
+CONJUNTOS = ("agenda", "frota", "time", "obras", "arquivo")
+
+
+class Armazenamento:
+    # Grupos de conjuntos que dividem a mesma revisão da origem (ex.: abas de uma planilha):
+    # uma gravação num deles muda a revisão de todos
+    REVISAO_COMPARTILHADA = ()
+
+    def revisoes(self):
+        # dict conjunto -> revisão atual da origem (muda a cada alteração).
+        # None: backend sem revisões, o cache usa o TTL de cada conjunto.
+        return None
+
+    def carregar_agenda(self):
+        raise NotImplementedError
+
+    def carregar_frota(self):
+        raise NotImplementedError
+
+    def carregar_time(self):
+        raise NotImplementedError
+
+    def carregar_obras(self):
+        raise NotImplementedError
+
+    def salvar_agenda(self, df_novo, df_base=None):
+        raise NotImplementedError
+
+    def salvar_atividade(self, atividade):
+        # Upsert de uma linha (dict com a coluna ID)
+        raise NotImplementedError
+
+    def excluir_atividade(self, id_atividade):
+        raise NotImplementedError
+
+    def carregar_arquivo(self):
+        # Atividades arquivadas (mesmas colunas da Agenda)
+        raise NotImplementedError
+
+    def arquivar(self, ids):
+        # Move as atividades da Agenda para o arquivo; retorna quantas foram movidas
+        raise NotImplementedError
+
+    def aplicar_alteracoes(self, atividades, exclusoes):
+        # Lote da fila de gravação: upserts (dicts com a coluna ID) + IDs a excluir.
+        # Backends que conseguem gravar tudo de uma vez sobrescrevem este método.
+        for atividade in atividades:
+            self.salvar_atividade(atividade)
+        for id_atividade in exclusoes:
+            self.excluir_atividade(id_atividade)
+
+
+# --- CONVERSÕES ---
+
+def _valor_simples(valor):
+    # Valor serializável em JSON, no mesmo formato lido da planilha
+    if valor is None:
+        return ""
+    try:
+        if pd.isna(valor):
+            return ""
+    except (TypeError, ValueError):
+        pass
+    if isinstance(valor, pd.Timestamp):
+        return valor.strftime('%d/%m/%Y')
+    if hasattr(valor, 'item') and not isinstance(valor, str):
+        valor = valor.item()
+    if isinstance(valor, (bool, int, float, str)):
+        return valor
+    return str(valor)
+
+def converter_datas(serie):
+    # A planilha mistura dd/mm/aaaa e aaaa-mm-dd; dayfirst sozinho inverteria dia e mês do ISO
+    texto = serie.astype(str).str.strip()
+    iso = texto.str.match(r'^\d{4}-\d{2}-\d{2}')
+    datas = pd.to_datetime(texto.where(~iso), format='mixed', dayfirst=True, errors='coerce')
+    if iso.any():
+        datas[iso] = pd.to_datetime(texto[iso].str[:10], format='%Y-%m-%d', errors='coerce')
+    return datas
+
+def _datas_iso(serie):
+    datas = converter_datas(serie)
+    return datas.dt.strftime('%Y-%m-%d').where(datas.notna(), None)
+
+def _para_iso(data):
+    return pd.Timestamp(data).strftime('%Y-%m-%d')
+
+def _assinatura(df):
+    # Resumo do conteúdo: a sincronização compara com o da vez anterior para não regravar igual
+    return hashlib.sha1(df.to_csv(index=False).encode()).hexdigest()
+
+
+# --- BACKEND SQLITE ---
+
+class ArmazenamentoSQLite(Armazenamento):
+    # Banco local indexado por datas. Serve para rodar offline/testes de carga
+    # ou como réplica de leitura da planilha (ver ArmazenamentoReplica).
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con:
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS agenda (
+                    id TEXT PRIMARY KEY,
+                    ordem INTEGER NOT NULL,
+                    inicio TEXT,
+                    fim TEXT,
+                    dados TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_agenda_inicio ON agenda (inicio);
+                CREATE INDEX IF NOT EXISTS idx_agenda_fim ON agenda (fim);
+                CREATE TABLE IF NOT EXISTS arquivo (
+                    id TEXT PRIMARY KEY,
+                    ordem INTEGER NOT NULL,
+                    inicio TEXT,
+                    fim TEXT,
+                    dados TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_arquivo_fim ON arquivo (fim);
+                CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT);
+            """)
+
+    def _conectar(self):
+        # Uma conexão por operação: o Streamlit atende cada sessão numa thread
+        return closing(sqlite3.connect(self.caminho, timeout=30))
+
+    def _meta(self, con, chave, padrao=None):
+        linha = con.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(linha[0]) if linha else padrao
+
+    def _definir_meta(self, con, chave, valor):
+        con.execute("INSERT INTO meta (chave, valor) VALUES (?, ?) "
+                    "ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor", (chave, json.dumps(valor)))
+
+    def _nova_revisao(self, con, *conjuntos):
+        # Um contador por conjunto: só o que foi gravado muda de revisão (e é recarregado no app).
+        # Gravação local também esquece a assinatura da última sincronização desse conjunto
+        revisoes = self._meta(con, 'revisoes', {})
+        assinaturas = self._meta(con, 'assinaturas', {})
+        for nome in conjuntos:
+            revisoes[nome] = revisoes.get(nome, 0) + 1
+            assinaturas.pop(nome, None)
+        self._definir_meta(con, 'revisoes', revisoes)
+        self._definir_meta(con, 'assinaturas', assinaturas)
+
+    def revisoes(self):
+        with self._conectar() as con:
+            revisoes = self._meta(con, 'revisoes', {})
+        return {nome: revisoes.get(nome, 0) for nome in CONJUNTOS}
+
+    # --- Agenda ---
+
+    def _linhas_para_df(self, con, linhas):
+        colunas = self._meta(con, 'colunas_agenda', [])
+        registros = [json.loads(dados) for (dados,) in linhas]
+        df = pd.DataFrame(registros)
+        extras = [c for c in df.columns if c not in colunas]
+        return df.reindex(columns=colunas + extras).fillna("") if colunas or extras else df
+
+    def carregar_agenda(self):
+        with self._conectar() as con:
+            linhas = con.execute("SELECT dados FROM agenda ORDER BY ordem").fetchall()
+            return self._linhas_para_df(con, linhas)
+
+    def consultar_periodo(self, inicio, fim):
+        # Atividades que se sobrepõem a [inicio, fim] (usa os índices de data)
+        with self._conectar() as con:
+            linhas = con.execute(
+                "SELECT dados FROM agenda WHERE inicio <= ? AND fim >= ? ORDER BY ordem",
+                (_para_iso(fim), _para_iso(inicio))
+            ).fetchall()
+            return self._linhas_para_df(con, linhas)
+
+    def _registros_agenda(self, df, ordem_inicial=0):
+        df = df.reset_index(drop=True)
+        datas = {col: _datas_iso(df[col]) if col in df.columns else pd.Series(None, index=df.index)
+                 for col in COLUNAS_DATA}
+        for i, registro in enumerate(df.to_dict('records')):
+            dados = {col: _valor_simples(v) for col, v in registro.items()}
+            yield (str(dados[COLUNA_ID]), ordem_inicial + i, datas[COLUNAS_DATA[0]].iloc[i],
+                   datas[COLUNAS_DATA[1]].iloc[i], json.dumps(dados, ensure_ascii=False))
+
+    def _substituir(self, con, tabela, df):
+        con.execute(f"DELETE FROM {tabela}")
+        con.executemany(f"INSERT INTO {tabela} (id, ordem, inicio, fim, dados) VALUES (?, ?, ?, ?, ?)",
+                        self._registros_agenda(df))
+
+    def salvar_agenda(self, df_novo, df_base=None):
+        with self._lock, self._conectar() as con, con:
+            self._substituir(con, 'agenda', df_novo)
+            self._definir_meta(con, 'colunas_agenda', list(df_novo.columns))
+            self._nova_revisao(con, 'agenda')
+
+    def salvar_atividade(self, atividade):
+        self.aplicar_alteracoes([atividade], [])
+
+    def excluir_atividade(self, id_atividade):
+        self.aplicar_alteracoes([], [id_atividade])
+
+    def aplicar_alteracoes(self, atividades, exclusoes):
+        # Uma transação para o lote inteiro
+        with self._lock, self._conectar() as con, con:
+            if atividades:
+                df = pd.DataFrame(atividades)
+                proxima = con.execute("SELECT COALESCE(MAX(ordem), -1) + 1 FROM agenda").fetchone()[0]
+                con.executemany(
+                    "INSERT INTO agenda (id, ordem, inicio, fim, dados) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET inicio = excluded.inicio, fim = excluded.fim, dados = excluded.dados",
+                    self._registros_agenda(df, proxima)
+                )
+                colunas = self._meta(con, 'colunas_agenda', [])
+                novas = [c for c in df.columns if c not in colunas]
+                if novas:
+                    self._definir_meta(con, 'colunas_agenda', colunas + novas)
+            if exclusoes:
+                con.executemany("DELETE FROM agenda WHERE id = ?", [(str(i),) for i in exclusoes])
+            self._nova_revisao(con, 'agenda')
+
+    # --- Arquivo ---
+
+    def carregar_arquivo(self):
+        with self._conectar() as con:
+            linhas = con.execute("SELECT dados FROM arquivo ORDER BY ordem").fetchall()
+            return self._linhas_para_df(con, linhas)
+
+    def arquivar(self, ids):
+        parametros = [(str(i),) for i in ids]
+        with self._lock, self._conectar() as con, con:
+            movidas = con.total_changes
+            con.executemany("INSERT OR REPLACE INTO arquivo (id, ordem, inicio, fim, dados) "
+                            "SELECT id, ordem, inicio, fim, dados FROM agenda WHERE id = ?", parametros)
+            movidas = con.total_changes - movidas
+            con.executemany("DELETE FROM agenda WHERE id = ?", parametros)
+            self._nova_revisao(con, 'agenda', 'arquivo')
+        return movidas
+
+    def _salvar_arquivo(self, df):
+        with self._lock, self._conectar() as con, con:
+            self._substituir(con, 'arquivo', df)
+            self._nova_revisao(con, 'arquivo')
+
+    # --- Cadastros e Obras ---
+
+    def _carregar_tabela(self, tabela):
+        with self._conectar() as con:
+            existe = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tabela,)).fetchone()
+            if not existe:
+                return pd.DataFrame()
+            return pd.read_sql_query(f'SELECT * FROM "{tabela}"', con)
+
+    def _salvar_tabela(self, tabela, df, indice=None):
+        with self._lock, self._conectar() as con, con:
+            df.to_sql(tabela, con, if_exists='replace', index=False)
+            if indice and indice in df.columns:
+                con.execute(f'CREATE INDEX IF NOT EXISTS "idx_{tabela}_{indice}" ON "{tabela}" ("{indice}")')
+            self._nova_revisao(con, tabela)
+
+    def carregar_frota(self):
+        return self._carregar_tabela('frota')
+
+    def carregar_time(self):
+        return self._carregar_tabela('time')
+
+    def carregar_obras(self):
+        return self._carregar_tabela('obras')
+
+    # --- Sincronização com outro backend ---
+
+    def sincronizar(self, origem):
+        # Só regrava (e muda a revisão de) o conjunto que chegou diferente da última sincronização
+        gravar = {
+            'agenda': (origem.carregar_agenda, self.salvar_agenda),
+            'frota': (origem.carregar_frota, lambda df: self._salvar_tabela('frota', df)),
+            'time': (origem.carregar_time, lambda df: self._salvar_tabela('time', df)),
+            'obras': (origem.carregar_obras, lambda df: self._salvar_tabela('obras', df, indice='Projeto')),
+            'arquivo': (origem.carregar_arquivo, self._salvar_arquivo),
+        }
+        with self._conectar() as con:
+            anteriores = self._meta(con, 'assinaturas', {})
+        novas = {}
+        for nome, (carregar, salvar) in gravar.items():
+            df = carregar()
+            novas[nome] = _assinatura(df)
+            if novas[nome] != anteriores.get(nome):
+                salvar(df)
+        with self._lock, self._conectar() as con, con:
+            self._definir_meta(con, 'assinaturas', {**self._meta(con, 'assinaturas', {}), **novas})
+            self._definir_meta(con, 'sincronizado_em', time.time())
+
+    def sincronizado_em(self):
+        with self._conectar() as con:
+            return self._meta(con, 'sincronizado_em')
+
+
+# --- RÉPLICA LOCAL ---
+
+class ArmazenamentoReplica(Armazenamento):
+    # Leituras no SQLite local, ressincronizado com a origem a cada `intervalo` segundos.
+    # Gravações vão primeiro para a origem (fonte da verdade) e depois para a réplica.
+
+    def __init__(self, local, origem, intervalo=300):
+        self.local = local
+        self.origem = origem
+        self.intervalo = intervalo
+        self._lock_sync = threading.Lock()
+
+    def _garantir_sincronizado(self):
+        ultimo = self.local.sincronizado_em()
+        if ultimo is not None and time.time() - ultimo < self.intervalo:
+            return
+        with self._lock_sync:
+            ultimo = self.local.sincronizado_em()
+            if ultimo is None or time.time() - ultimo >= self.intervalo:
+                self.local.sincronizar(self.origem)
+
+    def revisoes(self):
+        # Revisões do SQLite local: mudam numa gravação ou quando a sincronização traz um
+        # conjunto diferente (sincronizar sem mudança na origem não invalida nada)
+        self._garantir_sincronizado()
+        return self.local.revisoes()
+
+    def carregar_agenda(self):
+        self._garantir_sincronizado()
+        return self.local.carregar_agenda()
+
+    def consultar_periodo(self, inicio, fim):
+        self._garantir_sincronizado()
+        return self.local.consultar_periodo(inicio, fim)
+
+    def carregar_frota(self):
+        self._garantir_sincronizado()
+        return self.local.carregar_frota()
+
+    def carregar_time(self):
+        self._garantir_sincronizado()
+        return self.local.carregar_time()
+
+    def carregar_obras(self):
+        self._garantir_sincronizado()
+        return self.local.carregar_obras()
+
+    def carregar_arquivo(self):
+        self._garantir_sincronizado()
+        return self.local.carregar_arquivo()
+
+    def arquivar(self, ids):
+        movidas = self.origem.arquivar(ids)
+        self.local.arquivar(ids)
+        return movidas
+
+    def salvar_agenda(self, df_novo, df_base=None):
+        self.origem.salvar_agenda(df_novo, df_base)
+        self.local.salvar_agenda(df_novo)
+
+    def salvar_atividade(self, atividade):
+        self.origem.salvar_atividade(atividade)
+        self.local.salvar_atividade(atividade)
+
+    def excluir_atividade(self, id_atividade):
+        self.origem.excluir_atividade(id_atividade)
+        self.local.excluir_atividade(id_atividade)
+
+    def aplicar_alteracoes(self, atividades, exclusoes):
+        self.origem.aplicar_alteracoes(atividades, exclusoes)
+        self.local.aplicar_alteracoes(atividades, exclusoes)
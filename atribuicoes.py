@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+# --- TABELA DE ATRIBUIÇÕES (ATIVIDADE -> RECURSO) ---
+# "Executantes" é um texto separado por vírgula; aqui vira uma linha por (atividade, recurso)
+# com o recurso codificado como inteiro (posição no cadastro de Time / Frota). Consultas por
+# pessoa ou veículo viram fatias de arrays ordenados, sem varrer textos da agenda.
+
+PESSOA = 0
+VEICULO = 1
+
+def _vocabulario(cadastro, encontrados):
+    # Cadastro primeiro (códigos estáveis); nomes que só aparecem na agenda vão para o fim
+    cadastro = pd.Index(pd.Series(cadastro, dtype=object).dropna().astype(str).str.strip()).unique()
+    cadastro = cadastro[cadastro != ""]
+    extras = pd.Index(encontrados).unique().difference(cadastro)
+    return cadastro.append(extras)
+
+def _pessoas_por_linha(df_agenda):
+    if 'Executantes' not in df_agenda.columns:
+        return pd.Series(dtype=object)
+    pessoas = df_agenda['Executantes'].astype(object).fillna("").astype(str).str.split(',').explode().str.strip()
+    return pessoas[pessoas != ""]
+
+def _veiculos_por_linha(df_agenda):
+    if 'Veículo' not in df_agenda.columns:
+        return pd.Series(dtype=object)
+    veiculos = df_agenda['Veículo'].astype(object).fillna("").astype(str).str.strip()
+    return veiculos[veiculos != ""]
+
+
+class _Indice:
+    # Pares (linha, código) de um tipo de recurso, ordenados das duas formas (estilo CSR)
+
+    def __init__(self, linhas, codigos, tamanho):
+        self.linhas = linhas
+        self.codigos = codigos
+        por_recurso = np.argsort(codigos, kind='stable')
+        self._linhas_por_recurso = linhas[por_recurso]
+        self._inicio_recurso = np.searchsorted(codigos[por_recurso], np.arange(tamanho + 1))
+        por_linha = np.argsort(linhas, kind='stable')
+        self._linhas_ordenadas = linhas[por_linha]
+        self._codigos_por_linha = codigos[por_linha]
+
+    def linhas_com(self, codigos):
+        fatias = [self._linhas_por_recurso[self._inicio_recurso[c]:self._inicio_recurso[c + 1]] for c in codigos]
+        return np.unique(np.concatenate(fatias)) if fatias else np.array([], dtype=self.linhas.dtype)
+
+    def codigos_da_linha(self, linha):
+        desde = np.searchsorted(self._linhas_ordenadas, linha, side='left')
+        ate = np.searchsorted(self._linhas_ordenadas, linha, side='right')
+        return self._codigos_por_linha[desde:ate]
+
+
+class TabelaAtribuicoes:
+    def __init__(self, df_agenda, cadastro_pessoas=(), cadastro_veiculos=()):
+        pessoas = _pessoas_por_linha(df_agenda)
+        veiculos = _veiculos_por_linha(df_agenda)
+        self.nomes = {
+            PESSOA: _vocabulario(cadastro_pessoas, pessoas),
+            VEICULO: _vocabulario(cadastro_veiculos, veiculos),
+        }
+
+        self._indices = {}
+        for tipo, serie in ((PESSOA, pessoas), (VEICULO, veiculos)):
+            linhas = serie.index.to_numpy(dtype=np.int64)
+            codigos = self.nomes[tipo].get_indexer(serie.to_numpy()).astype(np.int32)
+            self._indices[tipo] = _Indice(linhas, codigos, len(self.nomes[tipo]))
+
+    def __len__(self):
+        return sum(len(indice.linhas) for indice in self._indices.values())
+
+    def para(self, df_agenda):
+        # Outra agenda (ex.: janela do arquivo) com os mesmos códigos de recurso
+        return TabelaAtribuicoes(df_agenda, self.nomes[PESSOA], self.nomes[VEICULO])
+
+    def codigos(self, tipo, nomes):
+        # Nomes fora do vocabulário são ignorados
+        codigos = self.nomes[tipo].get_indexer(pd.Index(list(nomes), dtype=object))
+        return codigos[codigos >= 0]
+
+    def linhas_com(self, tipo, nomes):
+        # Rótulos (índice da agenda) das atividades que usam algum dos recursos
+        return self._indices[tipo].linhas_com(self.codigos(tipo, nomes))
+
+    def recursos_da_linha(self, linha, tipo=PESSOA):
+        return self.nomes[tipo][self._indices[tipo].codigos_da_linha(linha)].tolist()
+
+    def tabela(self):
+        # Visão longa (linha, tipo, recurso) com os códigos inteiros
+        partes = [pd.DataFrame({'linha': indice.linhas, 'tipo': np.int8(tipo), 'recurso': indice.codigos})
+                  for tipo, indice in self._indices.items()]
+        return pd.concat(partes, ignore_index=True)
+
+    def filtrar(self, df, pessoas=(), veiculos=()):
+        # Mantém as linhas de df (rótulos da mesma agenda) com alguma das pessoas ou veículos
+        linhas = []
+        if pessoas:
+            linhas.append(self.linhas_com(PESSOA, pessoas))
+        if veiculos:
+            linhas.append(self.linhas_com(VEICULO, veiculos))
+        if not linhas:
+            return df
+        return df.loc[np.isin(df.index.to_numpy(), np.concatenate(linhas))]
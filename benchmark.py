@@ -0,0 +1,427 @@
+import argparse
+import io
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import httplib2
+import numpy as np
+import pandas as pd
+import streamlit.logger
+
+streamlit.logger.set_log_level("error")  # Sem runtime do Streamlit: silencia os avisos de cache
+
+import armazenamento
+import atribuicoes
+import catalogo
+import cliente_google
+import conexao
+import conflitos
+import ocupacao
+import planejamento
+
+# --- BENCHMARK DO PIPELINE ---
+# Gera Agenda/Frota/Time/Obras sintéticas, roda cada etapa contra clientes locais que imitam
+# o Sheets e o Drive e compara com uma execução anterior.
+#
+#   python benchmark.py                                  # 1k, 10k e 100k linhas
+#   python benchmark.py --linhas 1000 10000 --saida bench.json
+#   python benchmark.py --comparar bench.json            # aponta regressões (sai com código 1)
+#   python benchmark.py --semear-sqlite .cache/planejamento.db --linhas 50000
+#                                                        # banco do backend SQLite para rodar o app offline
+
+HOJE_BENCH = date(2025, 6, 2)  # Data fixa: mesmos dados e classificação em toda execução
+TAMANHOS_PADRAO = [1000, 10000, 100000]
+LIMIAR_REGRESSAO = 0.20
+MINIMO_REGRESSAO = 0.002  # Diferenças abaixo de 2 ms são ruído
+
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabi", "Hugo", "Iara", "João",
+         "Karen", "Lucas", "Marina", "Nilo", "Olga", "Paulo", "Rita", "Sérgio", "Tânia", "Vitor"]
+CIDADES = ["Curitiba", "Londrina", "Maringá", "Joinville", "Blumenau", "Cascavel", "Ponta Grossa"]
+
+
+# --- GERADOR DE DADOS SINTÉTICOS ---
+
+def gerar_time(qtd, rng):
+    nomes = [f"{NOMES[i % len(NOMES)]} {i // len(NOMES) + 1}" for i in range(qtd)]
+    return pd.DataFrame({'Nome': nomes, 'Função': rng.choice(["Técnico", "Eletricista", "Encarregado"], qtd)})
+
+def gerar_frota(qtd, rng):
+    placas = [f"{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}C-{1000 + i}" for i in range(qtd)]
+    return pd.DataFrame({'Veículo': [f"Veículo {i + 1}" for i in range(qtd)], 'Placa': placas})
+
+def gerar_obras(qtd, rng, colunas_extras=20):
+    # Planilha larga como a do dashboard: só 4 colunas interessam ao app
+    df = pd.DataFrame({
+        'Projeto': np.arange(10000, 10000 + qtd),
+        'Descricao': [f"Obra {i} - ampliação de subestação" for i in range(qtd)],
+        'Cliente': [f"Cliente {i % 300}" for i in range(qtd)],
+        'Cidade': rng.choice(CIDADES, qtd),
+    })
+    for i in range(colunas_extras):
+        df[f"Indicador {i + 1}"] = rng.random(qtd).round(4)
+    return df
+
+def _formatar_datas(datas, rng):
+    # Mistura os formatos vistos na planilha: dd/mm/aaaa, aaaa-mm-dd (plano_de_acao) e d/m/aaaa
+    formatos = rng.choice(3, len(datas), p=[0.7, 0.2, 0.1])
+    texto = np.where(formatos == 0, datas.strftime('%d/%m/%Y'),
+                     np.where(formatos == 1, datas.strftime('%Y-%m-%d'),
+                              [f"{d.day}/{d.month}/{d.year}" for d in datas]))
+    return texto
+
+def gerar_agenda(qtd, df_time, df_frota, df_obras, hoje, rng):
+    inicio = pd.Timestamp(hoje) + pd.to_timedelta(rng.integers(-700, 180, qtd), unit='D')
+    fim = inicio + pd.to_timedelta(rng.integers(0, 20, qtd), unit='D')
+    projetos = rng.choice(df_obras['Projeto'].to_numpy(), qtd).astype(str)
+    com_sufixo = rng.random(qtd) < 0.3
+    projetos = np.where(com_sufixo, np.char.add(projetos, ".0"), projetos)
+
+    nomes = df_time['Nome'].to_numpy()
+    tamanhos = rng.integers(1, 4, qtd)
+    executantes = [", ".join(rng.choice(nomes, t, replace=False)) for t in tamanhos]
+    veiculos = np.where(rng.random(qtd) < 0.6, rng.choice(df_frota['Veículo'].to_numpy(), qtd), "")
+
+    return pd.DataFrame({
+        'Projeto': projetos,
+        'Descrição': [f"Atividade {i}" for i in range(qtd)],
+        'Cliente': rng.choice(df_obras['Cliente'].to_numpy(), qtd),
+        'Data Início': _formatar_datas(pd.DatetimeIndex(inicio), rng),
+        'Data Fim': _formatar_datas(pd.DatetimeIndex(fim), rng),
+        'Executantes': executantes,
+        'Veículo': veiculos,
+        'Status': "Planejado",
+        conexao.COLUNA_ID: [f"b{i:07d}" for i in range(qtd)],
+    })
+
+def gerar_dados(qtd, hoje=HOJE_BENCH, semente=0):
+    rng = np.random.default_rng(semente)
+    df_time = gerar_time(max(20, qtd // 200), rng)
+    df_frota = gerar_frota(max(5, qtd // 1000), rng)
+    df_obras = gerar_obras(max(50, qtd // 10), rng)
+    df_agenda = gerar_agenda(qtd, df_time, df_frota, df_obras, hoje, rng)
+    return df_agenda, df_frota, df_time, df_obras
+
+
+# --- CLIENTES LOCAIS (SHEETS / DRIVE) ---
+
+class _AbaLocal:
+    def __init__(self, planilha, nome, sheet_id):
+        self.planilha = planilha
+        self.nome = nome
+        self.id = sheet_id
+
+    def batch_get(self, faixas):
+        valores = self.planilha.valores[self.nome]
+        cabecalho = valores[0]
+        letra = faixas[1].split(":")[0]
+        col = 0
+        for c in letra:
+            col = col * 26 + ord(c) - 64
+        return [[cabecalho], [[linha[col - 1]] for linha in valores]]
+
+    def clear(self):
+        self.planilha.valores[self.nome] = []
+
+    def update(self, valores):
+        self.planilha.valores[self.nome] = [[str(v) for v in linha] for linha in valores]
+
+
+class PlanilhaLocal:
+    # Responde como a API do Sheets: valores formatados (texto) e batchUpdate registrado
+    def __init__(self, abas):
+        self.valores = {nome: [list(df.columns)] + df.astype(str).to_numpy().tolist() for nome, df in abas.items()}
+        self.requisicoes = []
+
+    def values_batch_get(self, faixas):
+        return {'valueRanges': [{'range': f, 'values': self.valores.get(f, [])} for f in faixas]}
+
+    def worksheet(self, nome):
+        return _AbaLocal(self, nome, list(self.valores).index(nome))
+
+    def batch_update(self, corpo):
+        self.requisicoes.append(corpo)
+        return {'replies': [{} for _ in corpo['requests']]}
+
+
+class _ExecucaoLocal:
+    def __init__(self, resposta):
+        self.resposta = resposta
+
+    def execute(self, **kwargs):
+        return self.resposta
+
+
+class _HttpLocal:
+    def __init__(self, conteudo):
+        self.conteudo = conteudo
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        ini, fim = (int(x) for x in headers["range"].split("=")[1].split("-"))
+        parte = self.conteudo[ini:fim + 1]
+        resp = httplib2.Response({
+            "status": "206",
+            "content-range": f"bytes {ini}-{ini + len(parte) - 1}/{len(self.conteudo)}",
+        })
+        return resp, parte
+
+
+class _RequisicaoMidiaLocal:
+    def __init__(self, conteudo):
+        self.http = _HttpLocal(conteudo)
+        self.uri = "local://obras.xlsx"
+        self.headers = {}
+
+
+class DriveLocal:
+    # files().list() e files().get_media() sobre um xlsx em memória
+    def __init__(self, conteudo_xlsx, modificado="2025-06-01T00:00:00.000Z"):
+        self.conteudo = conteudo_xlsx
+        self.meta = {'id': "obras-local", 'name': conexao.EXCEL_FILE_NAME, 'modifiedTime': modificado,
+                     'md5Checksum': hashlib.md5(conteudo_xlsx).hexdigest()}
+
+    def files(self):
+        return self
+
+    def list(self, q=None, fields=None):
+        return _ExecucaoLocal({'files': [self.meta]})
+
+    def get_media(self, fileId):
+        return _RequisicaoMidiaLocal(self.conteudo)
+
+
+# --- EXECUÇÃO ---
+
+def _medir(funcao, repeticoes, preparar=None):
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        t0 = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - t0)
+    return statistics.median(tempos), resultado
+
+@contextmanager
+def _pasta_cache(pasta):
+    # conexao.PASTA_CACHE é global: vale só dentro do bloco e depois volta ao valor anterior
+    anterior = conexao.PASTA_CACHE
+    conexao.PASTA_CACHE = pasta
+    try:
+        yield pasta
+    finally:
+        conexao.PASTA_CACHE = anterior
+
+def origem_local(df_agenda, df_frota, df_time, df_obras):
+    # Backend Google sobre os clientes locais: mesmo caminho de leitura/gravação, sem rede
+    xlsx = io.BytesIO()
+    df_obras.to_excel(xlsx, index=False)
+    planilha = PlanilhaLocal({'Agenda': df_agenda, 'Frota': df_frota, 'Time': df_time})
+    cliente_google.configurar(None)  # Clientes locais: sem orçamento de cota (mediria só a espera)
+    return conexao.ArmazenamentoGoogle(planilha, DriveLocal(xlsx.getvalue()))
+
+def semear_sqlite(caminho, qtd, semente=0):
+    # Preenche o banco do backend SQLite com os dados sintéticos (Agenda, Frota, Time, Obras),
+    # pelo mesmo sincronizar() usado pela réplica
+    pasta = tempfile.mkdtemp(prefix="bench_cache_")
+    try:
+        with _pasta_cache(pasta):
+            armazenamento.ArmazenamentoSQLite(caminho).sincronizar(origem_local(*gerar_dados(qtd, semente=semente)))
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+def executar_tamanho(qtd, repeticoes=3, pasta_cache=None):
+    df_agenda, df_frota, df_time, df_obras = gerar_dados(qtd)
+    google = origem_local(df_agenda, df_frota, df_time, df_obras)
+    zoom_ini, zoom_fim = HOJE_BENCH, HOJE_BENCH + timedelta(days=30)
+    tempos = {}
+
+    tempos['sheets_leitura'], df_raw = _medir(google.carregar_agenda, repeticoes)
+
+    pasta_cache = pasta_cache or tempfile.mkdtemp(prefix="bench_cache_")
+    limpar = lambda: shutil.rmtree(pasta_cache, ignore_errors=True)
+    with _pasta_cache(pasta_cache):
+        tempos['obras_download'], _ = _medir(google.carregar_obras, repeticoes, preparar=limpar)
+        tempos['obras_snapshot'], df_obras_lido = _medir(google.carregar_obras, repeticoes)
+
+        # Backend SQLite: carga a partir da origem, leituras (inteira / por período) e um lote da fila
+        banco = os.path.join(pasta_cache, "bench.db")
+        remover_banco = lambda: os.path.exists(banco) and os.remove(banco)
+        tempos['sqlite_sincronizar'], _ = _medir(
+            lambda: armazenamento.ArmazenamentoSQLite(banco).sincronizar(google), repeticoes, preparar=remover_banco)
+        sqlite = armazenamento.ArmazenamentoSQLite(banco)
+        tempos['sqlite_agenda'], _ = _medir(sqlite.carregar_agenda, repeticoes)
+        tempos['sqlite_periodo'], _ = _medir(lambda: sqlite.consultar_periodo(zoom_ini, zoom_fim), repeticoes)
+        editada = {**df_agenda.iloc[0].to_dict(), 'Executantes': "Ana 1"}
+        nova = {**editada, conexao.COLUNA_ID: conexao.gerar_id()}
+        tempos['sqlite_lote'], _ = _medir(lambda: sqlite.aplicar_alteracoes([editada, nova], []), repeticoes)
+    limpar()
+
+    tempos['catalogo_montar'], cat = _medir(lambda: catalogo.CatalogoProjetos(df_obras_lido), repeticoes)
+    tempos['catalogo_buscar'], _ = _medir(lambda: cat.buscar("cliente 1"), repeticoes)
+
+    tempos['parse_indice'], (df_prep, indice) = _medir(
+        lambda: planejamento.preparar_agenda(conexao.normalizar_agenda(df_raw)), repeticoes)
+    tempos['classificar_total'], _ = _medir(
+        lambda: planejamento.classificar_situacao(df_prep['Data Início'], df_prep['Data Fim'], HOJE_BENCH), repeticoes)
+    tempos['janela_classificar'], df_processado = _medir(
+        lambda: planejamento.processar_janela(df_prep, indice, zoom_ini, zoom_fim, HOJE_BENCH), repeticoes)
+    tempos['filtrar_ordenar'], df_filtrado = _medir(
+        lambda: planejamento.filtrar_e_ordenar(df_processado, planejamento.SITUACOES), repeticoes)
+
+    planejamento.camadas_calendario.cache_clear()
+    tempos['figura'], fig = _medir(
+        lambda: planejamento.montar_figura(df_filtrado, zoom_ini, zoom_fim, HOJE_BENCH), repeticoes)
+    tempos['serializacao'], _ = _medir(fig.to_json, repeticoes)
+    nav_ini, nav_fim = planejamento.periodo_navegador(HOJE_BENCH)
+    df_navegador = planejamento.filtrar_e_ordenar(
+        planejamento.processar_janela(df_prep, indice, nav_ini, nav_fim, HOJE_BENCH), planejamento.SITUACOES)
+    tempos['figura_navegador'], fig_navegador = _medir(
+        lambda: planejamento.montar_figura_navegador(df_navegador, HOJE_BENCH), repeticoes)
+    tempos['serializacao_navegador'], _ = _medir(fig_navegador.to_json, repeticoes)
+    figuras = planejamento.CacheFiguras(planejamento.MAX_FIGURAS)
+    chave = planejamento.chave_figura(('bench',), zoom_ini, zoom_fim, planejamento.SITUACOES, [], [], HOJE_BENCH)
+    figuras.obter(chave, lambda: fig)
+    tempos['figura_memo'], _ = _medir(
+        lambda: figuras.obter(chave, lambda: planejamento.montar_figura(df_filtrado, zoom_ini, zoom_fim, HOJE_BENCH)),
+        repeticoes)
+
+    tempos['atribuicoes'], tabela = _medir(
+        lambda: atribuicoes.TabelaAtribuicoes(df_prep, conexao.lista_pessoas(df_time), conexao.lista_veiculos(df_frota)), repeticoes)
+    tempos['filtro_recurso'], _ = _medir(
+        lambda: planejamento.filtrar_recursos(df_processado, tabela, [df_time['Nome'].iloc[0]], []), repeticoes)
+    ano_ini = HOJE_BENCH - timedelta(days=182)
+    tempos['ocupacao_ano'], _ = _medir(
+        lambda: ocupacao.matrizes_ocupacao(tabela, df_prep, ano_ini, ano_ini + timedelta(days=364)), repeticoes)
+    tempos['conflitos'], _ = _medir(
+        lambda: conflitos.detectar_conflitos(conflitos.atribuicoes_com_datas(tabela, df_prep), tabela.nomes), repeticoes)
+
+    # Gravação: uma atividade editada + uma nova (caminho incremental)
+    df_novo = df_raw.copy()
+    df_novo.loc[df_novo.index[0], 'Executantes'] = "Ana 1"
+    nova = df_novo.iloc[[0]].assign(**{conexao.COLUNA_ID: ""})
+    df_novo = conexao.serializar_agenda(conexao.garantir_ids(pd.concat([df_novo, nova], ignore_index=True)))
+    tempos['salvar_diff'], _ = _medir(lambda: google.salvar_agenda(df_novo, df_raw), repeticoes)
+
+    return {etapa: round(segundos, 6) for etapa, segundos in tempos.items()}
+
+# --- LEITURA DO EXCEL DE OBRAS (PLANILHA LARGA) ---
+# Compara o caminho antigo (pd.read_excel da aba inteira) com a leitura enxuta
+# (openpyxl somente leitura, só as colunas usadas): tempo (mediana) e pico de memória
+# (tracemalloc, numa execução separada porque o rastreamento deixa tudo mais lento).
+
+def _pico_memoria(funcao):
+    tracemalloc.start()
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def comparar_leitura_obras(qtd, repeticoes=3, colunas_extras=40):
+    xlsx = io.BytesIO()
+    gerar_obras(qtd, np.random.default_rng(0), colunas_extras).to_excel(xlsx, index=False)
+    caminhos = {
+        'read_excel': lambda: conexao._colunas_texto(pd.read_excel(io.BytesIO(xlsx.getvalue()))),
+        'openpyxl_enxuto': lambda: conexao.ler_obras_excel(io.BytesIO(xlsx.getvalue())),
+    }
+    resultado = {'linhas': qtd, 'colunas': 4 + colunas_extras, 'xlsx_kb': len(xlsx.getvalue()) // 1024}
+    for nome, funcao in caminhos.items():
+        segundos, df = _medir(funcao, repeticoes)
+        resultado[nome] = {'segundos': round(segundos, 3), 'pico_mb': round(_pico_memoria(funcao) / 2 ** 20, 1),
+                           'colunas_lidas': df.shape[1]}
+    return resultado
+
+def comparar(atual, anterior, limiar=LIMIAR_REGRESSAO):
+    regressoes = []
+    for qtd, etapas in atual['resultados'].items():
+        base = anterior.get('resultados', {}).get(qtd, {})
+        for etapa, segundos in etapas.items():
+            antes = base.get(etapa)
+            if antes and segundos - antes > MINIMO_REGRESSAO and segundos > antes * (1 + limiar):
+                regressoes.append((qtd, etapa, antes, segundos))
+    return regressoes
+
+def imprimir(resultados, anterior=None):
+    etapas = list(next(iter(resultados.values())))
+    tamanhos = list(resultados)
+    print(f"{'etapa':<20}" + "".join(f"{t + ' linhas':>18}" for t in tamanhos))
+    for etapa in etapas:
+        linha = f"{etapa:<20}"
+        for t in tamanhos:
+            atual = resultados[t][etapa]
+            antes = (anterior or {}).get('resultados', {}).get(t, {}).get(etapa)
+            delta = f" ({(atual / antes - 1) * 100:+.0f}%)" if antes else ""
+            linha += f"{atual * 1000:>10.1f} ms{delta:>6}"
+        print(linha)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de planejamento")
+    parser.add_argument("--linhas", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--limiar", type=float, default=LIMIAR_REGRESSAO, help="Aumento relativo tolerado (0.2 = 20%%)")
+    parser.add_argument("--obras-excel", type=int, metavar="LINHAS",
+                        help="Só compara as leituras do Excel de Obras (planilha larga com LINHAS obras)")
+    parser.add_argument("--semear-sqlite", metavar="CAMINHO",
+                        help="Só grava os dados sintéticos (primeiro valor de --linhas) num banco SQLite")
+    args = parser.parse_args(argv)
+
+    if args.semear_sqlite:
+        qtd = args.linhas[0]
+        semear_sqlite(args.semear_sqlite, qtd)
+        print(f"{qtd} atividades gravadas em {args.semear_sqlite}. No secrets.toml:\n"
+              f"[armazenamento]\nbackend = \"sqlite\"\ncaminho = \"{args.semear_sqlite}\"")
+        return 0
+
+    if args.obras_excel:
+        resultado = comparar_leitura_obras(args.obras_excel, args.repeticoes)
+        print(f"Excel de Obras: {resultado['linhas']} linhas x {resultado['colunas']} colunas ({resultado['xlsx_kb']} KB)")
+        for nome in ('read_excel', 'openpyxl_enxuto'):
+            r = resultado[nome]
+            print(f"{nome:<18}{r['segundos'] * 1000:>10.0f} ms{r['pico_mb']:>10.1f} MB pico   {r['colunas_lidas']} colunas")
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as f:
+                json.dump(resultado, f, indent=2)
+        return 0
+
+    atual = {
+        'meta': {'data': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                 'pandas': pd.__version__, 'repeticoes': args.repeticoes},
+        'resultados': {},
+    }
+    for qtd in args.linhas:
+        print(f"-> {qtd} linhas...", file=sys.stderr)
+        atual['resultados'][str(qtd)] = executar_tamanho(qtd, args.repeticoes)
+
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anterior = json.load(f)
+    imprimir(atual['resultados'], anterior)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(atual, f, indent=2)
+
+    if anterior:
+        regressoes = comparar(atual, anterior, args.limiar)
+        for qtd, etapa, antes, depois in regressoes:
+            print(f"REGRESSÃO {qtd} linhas / {etapa}: {antes * 1000:.1f} ms -> {depois * 1000:.1f} ms")
+        return 1 if regressoes else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
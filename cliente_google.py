@@ -0,0 +1,213 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import google_auth_httplib2
+import httplib2
+import requests
+from google.auth.transport.requests import AuthorizedSession
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+from requests.adapters import HTTPAdapter
+
+import metricas
+
+# --- CLIENTE GOOGLE COM COTA, RETENTATIVAS E CONEXÕES REAPROVEITADAS ---
+# Toda chamada ao Sheets (gspread) e ao Drive (googleapiclient) passa por executar():
+#   1. consome uma ficha do orçamento do serviço (token bucket por API, compartilhado entre sessões);
+#   2. leituras (GET): em 429/5xx/erro de rede espera com backoff exponencial + jitter e tenta de novo;
+#      gravações: só em 429 (a requisição não foi aplicada). Timeout ou 5xx numa gravação sobe para
+#      quem chamou, que relê a planilha e refaz o diff em vez de repetir a mesma requisição
+#      (um appendCells ou deleteDimension por posição repetido duplicaria ou apagaria outras linhas);
+#   3. registra latência e retentativas por endpoint em metricas ("google.<endpoint>",
+#      resumidas por metricas.resumo_endpoints()).
+
+REQUISICOES_POR_MINUTO = 60   # Cota padrão do Sheets por usuário (a conta de serviço)
+RAJADA = 10
+DRIVE_POR_MINUTO = 300        # Drive (revisões e download do Excel) tem cota própria, bem maior
+DRIVE_RAJADA = 20
+MAX_TENTATIVAS = 6
+ESPERA_BASE = 1.0
+ESPERA_MAXIMA = 32.0
+TIMEOUT = 60
+STATUS_RETENTAVEIS = {429, 500, 502, 503, 504}
+
+
+class OrcamentoRequisicoes:
+    # Token bucket: `taxa` fichas por segundo, acumulando até `capacidade`
+
+    def __init__(self, por_minuto, capacidade):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = float(capacidade)
+        self._fichas = float(capacidade)
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._fichas = min(self.capacidade, self._fichas + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def consumir(self, fichas=1):
+        # Bloqueia até haver fichas; devolve quanto tempo esperou
+        esperado = 0.0
+        while True:
+            with self._lock:
+                self._repor()
+                if self._fichas >= fichas:
+                    self._fichas -= fichas
+                    return esperado
+                falta = (fichas - self._fichas) / self.taxa
+            time.sleep(falta)
+            esperado += falta
+
+    def penalizar(self):
+        # O servidor respondeu 429: zera as fichas para as outras sessões também segurarem
+        with self._lock:
+            self._repor()
+            self._fichas = min(self._fichas, 0.0)
+
+
+_orcamentos = {
+    'sheets': OrcamentoRequisicoes(REQUISICOES_POR_MINUTO, RAJADA),
+    'drive': OrcamentoRequisicoes(DRIVE_POR_MINUTO, DRIVE_RAJADA),
+}
+
+def configurar(requisicoes_por_minuto=REQUISICOES_POR_MINUTO, rajada=RAJADA,
+               drive_por_minuto=DRIVE_POR_MINUTO, drive_rajada=DRIVE_RAJADA):
+    # requisicoes_por_minuto=None desliga os orçamentos (ex.: benchmark com clientes locais)
+    global _orcamentos
+    if not requisicoes_por_minuto:
+        _orcamentos = {}
+        return
+    _orcamentos = {
+        'sheets': OrcamentoRequisicoes(requisicoes_por_minuto, rajada),
+        'drive': OrcamentoRequisicoes(drive_por_minuto, drive_rajada),
+    }
+
+def _orcamento(endpoint):
+    # "sheets.values:batchGet" -> orçamento do Sheets; "drive.files.list" -> do Drive
+    return _orcamentos.get(endpoint.split(".", 1)[0])
+
+
+# --- EXECUÇÃO COM BACKOFF ---
+
+def _classificar_erro(erro):
+    # (pode tentar de novo?, status HTTP, Retry-After em segundos)
+    if isinstance(erro, APIError):
+        resposta = erro.response
+        return resposta.status_code in STATUS_RETENTAVEIS, resposta.status_code, resposta.headers.get('Retry-After')
+    if isinstance(erro, HttpError):
+        status = int(erro.resp.status)
+        return status in STATUS_RETENTAVEIS, status, erro.resp.get('retry-after')
+    if isinstance(erro, (requests.ConnectionError, requests.Timeout, httplib2.HttpLib2Error,
+                         ConnectionError, TimeoutError)):
+        return True, None, None
+    return False, None, None
+
+def falha_transitoria(erro):
+    # Erro de rede/5xx/429: para gravações, sinal de reler a planilha e refazer o diff
+    return _classificar_erro(erro)[0]
+
+def _espera(tentativa, retry_after):
+    # Full jitter: sorteia em [0, teto] para as sessões não voltarem todas juntas
+    teto = min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** tentativa)
+    espera = random.uniform(0, teto)
+    try:
+        return max(espera, float(retry_after)) if retry_after else espera
+    except ValueError:
+        return espera
+
+def executar(endpoint, funcao, idempotente=True):
+    # idempotente=False (gravações): só repete em 429, quando o servidor recusou sem aplicar
+    nome = f"google.{endpoint}"
+    orcamento = _orcamento(endpoint)
+    for tentativa in range(MAX_TENTATIVAS):
+        if orcamento is not None:
+            esperado = orcamento.consumir()
+            if esperado:
+                metricas.registrar(f"{nome}.fila_orcamento", esperado)
+        t0 = time.perf_counter()
+        try:
+            resultado = funcao()
+        except Exception as e:
+            retentavel, status, retry_after = _classificar_erro(e)
+            metricas.registrar(nome, time.perf_counter() - t0, erro=str(status or type(e).__name__))
+            if not idempotente and status != 429:
+                retentavel = False
+            if not retentavel or tentativa == MAX_TENTATIVAS - 1:
+                raise
+            if status == 429:
+                metricas.contar(f"{nome}.limitadas")
+                if orcamento is not None:
+                    orcamento.penalizar()
+            metricas.contar(f"{nome}.retentativas")
+            time.sleep(_espera(tentativa, retry_after))
+            continue
+        metricas.registrar(nome, time.perf_counter() - t0)
+        return resultado
+
+
+# --- SHEETS (gspread) ---
+
+def _endpoint_sheets(metodo, url):
+    # /v4/spreadsheets/<id>/values:batchGet -> "sheets.values:batchGet" (sem IDs/faixas no nome)
+    partes = [p for p in urlparse(url).path.split("/") if p]
+    if "spreadsheets" in partes:
+        resto = partes[partes.index("spreadsheets") + 1:]
+        acao = resto[0].partition(":")[2] if resto else ""
+        if len(resto) > 1:
+            acao = resto[1].split("/")[0]
+        return f"sheets.{acao or metodo.lower()}"
+    if "files" in partes:
+        return f"drive.files.{metodo.lower()}"
+    return f"{urlparse(url).netloc}.{metodo.lower()}"
+
+def sessao_compartilhada(credenciais, conexoes=16):
+    # Uma sessão HTTP (keep-alive) para o processo inteiro, com pool para as threads de carga
+    sessao = AuthorizedSession(credenciais)
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=conexoes)
+    sessao.mount("https://", adaptador)
+    return sessao
+
+class ClienteSheets(HTTPClient):
+    # HTTPClient do gspread com orçamento/backoff em cada requisição
+
+    def __init__(self, auth, session=None):
+        super().__init__(auth, session=session)
+        self.set_timeout(TIMEOUT)
+
+    def request(self, method, endpoint, *args, **kwargs):
+        chamada = lambda: super(ClienteSheets, self).request(method, endpoint, *args, **kwargs)
+        return executar(_endpoint_sheets(method, endpoint), chamada, idempotente=method.upper() == "GET")
+
+
+# --- DRIVE (googleapiclient) ---
+# httplib2 não é thread-safe: cada thread usa o seu AuthorizedHttp, reaproveitado entre chamadas.
+
+_http_threads = threading.local()
+
+def http_da_thread(http):
+    credenciais = getattr(http, 'credentials', None)
+    if credenciais is None:
+        return http
+    cache = getattr(_http_threads, 'por_credencial', None)
+    if cache is None:
+        cache = _http_threads.por_credencial = {}
+    if id(credenciais) not in cache:
+        cache[id(credenciais)] = google_auth_httplib2.AuthorizedHttp(credenciais, http=httplib2.Http(timeout=TIMEOUT))
+    return cache[id(credenciais)]
+
+class RequisicaoDrive(HttpRequest):
+    # requestBuilder do build(): troca o http pelo da thread e executa via executar()
+
+    def __init__(self, http, *args, **kwargs):
+        super().__init__(http_da_thread(http), *args, **kwargs)
+
+    def execute(self, http=None, num_retries=0):
+        endpoint = f"drive.{self.methodId.split('.', 1)[-1]}" if self.methodId else "drive"
+        return executar(endpoint, lambda: super(RequisicaoDrive, self).execute(http=http),
+                        idempotente=self.method.upper() == "GET")
@@ -1,77 +1,960 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
 import io
+import json
+import os
+import threading
+import time
+import uuid
+import pytz
+from datetime import datetime, timedelta
+import armazenamento
+import atribuicoes
+import catalogo
+import fila_gravacao
+import metricas
+import revisoes
 
 # --- CONFIGURAÇÕES DE NOMES ---
 SHEET_NAME = "Agenda_dados_planejamento"
+ABA_ARQUIVO = "Arquivo"
 EXCEL_FILE_NAME = "dados_dashboard_obras.xlsx"
 
+# Pasta local para snapshots (Parquet) dos dados baixados do Drive
+PASTA_CACHE = ".cache"
+
+# Chave estável de cada linha da Agenda (usada na gravação incremental)
+COLUNA_ID = armazenamento.COLUNA_ID
+
 SCOPES = [
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive"
 ]
 
+# gspread, googleapiclient e google.oauth2 (+ cliente_google, que depende deles) só são
+# importados quando o backend Google é usado: ~0,3 s a menos na partida do processo e
+# nada disso carrega com o backend SQLite.
+
+def _configurar_cota():
+    # [google] no secrets.toml (opcional): requisicoes_por_minuto = 60, rajada = 10 (Sheets),
+    # drive_por_minuto = 300, drive_rajada = 20 (Drive)
+    import cliente_google
+    try:
+        config = dict(st.secrets.get("google", {}))
+    except Exception:
+        config = {}
+    cliente_google.configurar(
+        int(config.get('requisicoes_por_minuto', cliente_google.REQUISICOES_POR_MINUTO)),
+        int(config.get('rajada', cliente_google.RAJADA)),
+        int(config.get('drive_por_minuto', cliente_google.DRIVE_POR_MINUTO)),
+        int(config.get('drive_rajada', cliente_google.DRIVE_RAJADA))
+    )
+
 @st.cache_resource
+@metricas.cronometrado("conexao.conectar_apis")
 def conectar_apis():
+    # Um cliente por processo: sessão HTTP, orçamento de requisições e backoff compartilhados
+    import gspread
+    from google.oauth2.service_account import Credentials
+    from googleapiclient.discovery import build
+    import cliente_google
+
     creds_dict = st.secrets["gcp_service_account"]
     creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-    gc = gspread.authorize(creds)
-    drive_service = build('drive', 'v3', credentials=creds)
+    _configurar_cota()
+    gc = gspread.authorize(creds, http_client=cliente_google.ClienteSheets,
+                           session=cliente_google.sessao_compartilhada(creds))
+    # Documento de descoberta estático (vem no pacote): sem buscar o JSON da API na partida
+    drive_service = build('drive', 'v3', credentials=creds, requestBuilder=cliente_google.RequisicaoDrive,
+                          static_discovery=True, cache_discovery=False)
     return gc, drive_service
 
-def buscar_id_por_nome(drive_service, filename):
+@st.cache_resource
+@metricas.cronometrado("conexao.abrir_planilha")
+def abrir_planilha():
+    gc, _ = conectar_apis()
+    return gc.open(SHEET_NAME)
+
+def buscar_arquivo_por_nome(drive_service, filename):
+    # Metadados de versão vêm na mesma chamada da busca (sem custo extra)
     query = f"name = '{filename}' and trashed = false"
-    results = drive_service.files().list(q=query, fields="files(id, name)").execute()
+    results = drive_service.files().list(q=query, fields="files(id, name, modifiedTime, md5Checksum)").execute()
     items = results.get('files', [])
     if not items:
-        st.error(f"ERRO: Arquivo '{filename}' não encontrado no Drive.")
-        st.stop()
-    return items[0]['id']
+        raise FileNotFoundError(f"ERRO: Arquivo '{filename}' não encontrado no Drive.")
+    return items[0]
 
-@st.cache_data(ttl=600)
-def carregar_dados():
-    gc, drive_service = conectar_apis()
-    
-    # 1. Carregar Google Sheets
+def buscar_id_por_nome(drive_service, filename):
+    return buscar_arquivo_por_nome(drive_service, filename)['id']
+
+# --- SNAPSHOT LOCAL DO EXCEL ---
+
+def _caminhos_snapshot_obras():
+    return os.path.join(PASTA_CACHE, "obras.parquet"), os.path.join(PASTA_CACHE, "obras.json")
+
+def _versao_arquivo(meta):
+    # As colunas lidas entram na versão: snapshots antigos (planilha inteira) são refeitos
+    return {"id": meta.get('id'), "modifiedTime": meta.get('modifiedTime'), "md5Checksum": meta.get('md5Checksum'),
+            "colunas": list(COLUNAS_OBRAS)}
+
+def _ler_snapshot_obras(meta):
+    caminho_dados, caminho_meta = _caminhos_snapshot_obras()
     try:
-        sh = gc.open(SHEET_NAME) 
-        ws_agenda = sh.worksheet("Agenda")
-        ws_frota = sh.worksheet("Frota")
-        ws_time = sh.worksheet("Time") # <--- NOVO: Carrega aba Time
-        
-        df_agenda = pd.DataFrame(ws_agenda.get_all_records())
-        df_frota = pd.DataFrame(ws_frota.get_all_records())
-        df_time = pd.DataFrame(ws_time.get_all_records()) # <--- NOVO
-        
-    except Exception as e:
-        st.error(f"Erro ao carregar Planilha Google: {e}")
-        st.stop()
+        with open(caminho_meta, encoding="utf-8") as f:
+            versao_local = json.load(f)
+        if versao_local != _versao_arquivo(meta):
+            return None
+        return pd.read_parquet(caminho_dados)
+    except Exception:
+        return None
 
-    # 2. Carregar Excel do Drive
-    excel_id = buscar_id_por_nome(drive_service, EXCEL_FILE_NAME)
+def _salvar_snapshot_obras(df_obras, meta):
+    caminho_dados, caminho_meta = _caminhos_snapshot_obras()
     try:
-        request = drive_service.files().get_media(fileId=excel_id)
+        os.makedirs(PASTA_CACHE, exist_ok=True)
+        df_obras.to_parquet(caminho_dados + ".tmp", index=False)
+        os.replace(caminho_dados + ".tmp", caminho_dados)
+        with open(caminho_meta + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(_versao_arquivo(meta), f)
+        os.replace(caminho_meta + ".tmp", caminho_meta)
+    except Exception:
+        # O snapshot é só uma otimização: sem ele o próximo carregamento baixa de novo
+        pass
+
+def _colunas_texto(df):
+    # Colunas object com tipos misturados (ex.: Projeto numérico e texto) viram texto,
+    # para que o Parquet aceite e o resultado seja o mesmo com ou sem snapshot
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+def _valores_para_df(valores):
+    # Mesmo resultado do get_all_records(), a partir da resposta crua de values
+    from gspread.utils import numericise_all
+    if not valores:
+        return pd.DataFrame()
+    cabecalho, linhas = valores[0], valores[1:]
+    n = len(cabecalho)
+    # A coluna ID fica como texto (IDs antigos só com hexadecimal podem parecer números)
+    texto = [i + 1 for i, nome in enumerate(cabecalho) if nome == COLUNA_ID]
+    registros = [numericise_all((linha + [""] * n)[:n], default_blank="", ignore=texto) for linha in linhas]
+    return pd.DataFrame(registros, columns=cabecalho)
+
+def _ler_abas(sh, abas):
+    # Valores crus via values:batchGet (uma requisição para as abas pedidas). Os carregadores
+    # pedem uma aba cada: cada conjunto tem cache e revisão próprios e é recarregado sozinho
+    resposta = sh.values_batch_get(list(abas))
+    faixas = resposta.get('valueRanges', [])
+    return [_valores_para_df(faixa.get('values', [])) for faixa in faixas]
+
+# --- LEITURA ENXUTA DO EXCEL DE OBRAS ---
+# O Excel do dashboard é largo (dezenas de indicadores), mas o app só usa estas colunas.
+# O openpyxl em modo somente leitura entrega uma linha por vez: o cabeçalho é resolvido uma
+# vez e só as células das colunas usadas são guardadas (nunca a planilha inteira em memória).
+
+COLUNAS_OBRAS = ['Projeto', 'Descricao', 'Descrição', 'Cliente', 'Cidade']
+
+def _texto_excel(valor):
+    # Como o pd.read_excel + _colunas_texto: 1234.0 -> "1234", vazio -> None
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+def ler_obras_excel(arquivo, colunas=COLUNAS_OBRAS):
+    from openpyxl import load_workbook
+
+    livro = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        aba = livro.worksheets[0]
+        linhas = aba.iter_rows(values_only=True)
+        cabecalho = [str(c).strip() if c is not None else "" for c in next(linhas, ())]
+        posicoes = {}
+        for i, nome in enumerate(cabecalho):
+            if nome in colunas and nome not in posicoes:  # Nome repetido: vale a primeira coluna
+                posicoes[nome] = i
+        if not posicoes:
+            return pd.DataFrame()
+
+        ultima = max(posicoes.values()) + 1
+        valores = {nome: [] for nome in posicoes}
+        for linha in aba.iter_rows(min_row=2, max_col=ultima, values_only=True):
+            celulas = [_texto_excel(linha[i]) if i < len(linha) else None for i in posicoes.values()]
+            if all(c is None for c in celulas):
+                continue  # Linha vazia (read_excel também descarta)
+            for nome, celula in zip(posicoes, celulas):
+                valores[nome].append(celula)
+    finally:
+        livro.close()
+
+    return pd.DataFrame({nome: pd.Series(lista, dtype="string") for nome, lista in valores.items()})
+
+def _baixar_obras(drive_service):
+    from googleapiclient.http import MediaIoBaseDownload
+    import cliente_google
+
+    with metricas.medir("obras.drive_busca"):
+        meta = buscar_arquivo_por_nome(drive_service, EXCEL_FILE_NAME)
+
+    # Arquivo não mudou no Drive -> usa o snapshot local (sem download nem openpyxl)
+    with metricas.medir("obras.snapshot_leitura"):
+        df_obras = _ler_snapshot_obras(meta)
+    if df_obras is not None:
+        metricas.contar("obras.snapshot_reaproveitado")
+        return df_obras
+
+    with metricas.medir("obras.drive_download"):
+        request = drive_service.files().get_media(fileId=meta['id'])
         file_io = io.BytesIO()
         downloader = MediaIoBaseDownload(file_io, request)
         done = False
         while done is False:
-            status, done = downloader.next_chunk()
+            status, done = cliente_google.executar("drive.files.get_media", downloader.next_chunk)
         file_io.seek(0)
-        df_obras = pd.read_excel(file_io)
+
+    with metricas.medir("obras.excel_leitura"):
+        df_obras = ler_obras_excel(file_io)
+
+    _salvar_snapshot_obras(df_obras, meta)
+    return df_obras
+
+# --- CARREGADORES POR CONJUNTO DE DADOS ---
+# Cada conjunto tem seu próprio cache e só é recarregado quando a revisão da origem muda
+# (versão da planilha / do Excel no Drive, consultada a cada INTERVALO_REVISAO segundos).
+# A recarga roda em segundo plano, uma por conjunto, e as páginas recebem o valor anterior
+# enquanto isso. Backends sem revisão caem no TTL: a "revisão" vira a janela de tempo.
+
+INTERVALO_REVISAO = 20
+TTL_AGENDA = 600
+TTL_CADASTROS = 3600  # Frota e Time mudam pouco
+TTL_OBRAS = 3600
+TTL_ARQUIVO = 3600
+TTLS = {'agenda': TTL_AGENDA, 'frota': TTL_CADASTROS, 'time': TTL_CADASTROS, 'obras': TTL_OBRAS,
+        'arquivo': TTL_ARQUIVO}
+
+@st.cache_resource
+def _conjuntos():
+    backend = obter_armazenamento()
+    return {
+        'agenda': revisoes.ConjuntoVersionado('agenda', backend.carregar_agenda),
+        'frota': revisoes.ConjuntoVersionado('frota', backend.carregar_frota),
+        'time': revisoes.ConjuntoVersionado('time', backend.carregar_time),
+        'obras': revisoes.ConjuntoVersionado('obras', backend.carregar_obras),
+        'arquivo': revisoes.ConjuntoVersionado('arquivo', backend.carregar_arquivo),
+    }
+
+def _revisao(nome, atuais):
+    if atuais and atuais.get(nome) is not None:
+        return atuais[nome]
+    return f"ttl-{int(time.time() // TTLS[nome])}"
+
+def _atualizar_mudancas(atuais, proprios=()):
+    # Recarrega só os conjuntos cuja revisão mudou. Os que mudaram por uma gravação nossa só
+    # passam a aceitar a revisão nova: quem gravou recarrega o que de fato mudou
+    for nome, conjunto in _conjuntos().items():
+        if nome in proprios:
+            conjunto.confirmar(_revisao(nome, atuais))
+        else:
+            conjunto.atualizar(_revisao(nome, atuais))
+
+@st.cache_resource
+def _monitor_revisoes():
+    backend = obter_armazenamento()
+    return revisoes.MonitorRevisoes(backend.revisoes, INTERVALO_REVISAO, ao_mudar=_atualizar_mudancas,
+                                    compartilhadas=backend.REVISAO_COMPARTILHADA)
+
+def _obter_conjunto(nome):
+    # A cópia leva a versão da carga em attrs: derivados (normalização, catálogo,
+    # atribuições) usam essa chave no cache em vez de fazer hash do DataFrame
+    conjunto = _conjuntos()[nome]
+    valor = conjunto.obter(_revisao(nome, _monitor_revisoes().atuais()))
+    atual, versao = conjunto.atual()
+    if atual is None:  # Descartado no meio ("Limpar Cache"): vale o que já foi obtido
+        atual, versao = valor, ("avulso", uuid.uuid4().hex)
+    df = atual.copy()
+    df.attrs['versao'] = f"{nome}:{versao[0]}:{versao[1]}"
+    return df
+
+def carregar_agenda():
+    try:
+        return _obter_conjunto('agenda')
+    except Exception as e:
+        st.error(f"Erro ao carregar Planilha Google: {e}")
+        st.stop()
+
+def carregar_frota():
+    try:
+        return _obter_conjunto('frota')
+    except Exception as e:
+        st.error(f"Erro ao carregar Planilha Google: {e}")
+        st.stop()
+
+def carregar_time():
+    try:
+        return _obter_conjunto('time')
+    except Exception as e:
+        st.error(f"Erro ao carregar Planilha Google: {e}")
+        st.stop()
+
+def carregar_obras():
+    try:
+        return _obter_conjunto('obras')
+    except FileNotFoundError as e:
+        st.error(str(e))
+        st.stop()
     except Exception as e:
         st.error(f"Erro ao baixar Excel: {e}")
         st.stop()
-    
-    return df_agenda, df_frota, df_time, df_obras # <--- Retorna 4 itens agora
-    
-def salvar_no_sheets(df_novo):
-    gc, _ = conectar_apis()
-    sh = gc.open(SHEET_NAME)
-    ws = sh.worksheet("Agenda")
+
+CARREGADORES = {
+    'agenda': carregar_agenda,
+    'frota': carregar_frota,
+    'time': carregar_time,
+    'obras': carregar_obras,
+}
+
+# --- DERIVADOS EM CACHE POR VERSÃO ---
+# Normalização, catálogo, atribuições etc. são chaveados pela versão dos dados (1º argumento,
+# ver versao_dados), não pelo hash dos frames: os demais argumentos começam com "_" e ficam
+# fora da chave. cache_resource devolve o próprio objeto guardado, sem copiar nem desserializar
+# a cada execução: quem recebe trata o resultado como somente leitura (copia antes de alterar).
+
+def cache_por_versao(nome, max_entries=2):
+    # Conta o acesso a cada chamada e o miss quando o corpo roda (metricas.acesso/miss_cache)
+    def decorar(funcao):
+        @functools.wraps(funcao)
+        def montar(*args, **kwargs):
+            metricas.miss_cache(nome)
+            return funcao(*args, **kwargs)
+        em_cache = st.cache_resource(show_spinner=False, max_entries=max_entries)(montar)
+
+        @functools.wraps(funcao)
+        def obter(*args, **kwargs):
+            metricas.acesso_cache(nome)
+            return em_cache(*args, **kwargs)
+        obter.clear = em_cache.clear
+        return obter
+    return decorar
+
+# --- CATÁLOGO DE PROJETOS ---
+# Índices das Obras (código -> dados, prefixo, trecho) montados uma vez por revisão do Excel,
+# e não a cada execução do modal de agendamento.
+
+@cache_por_versao('catalogo_projetos')
+def _catalogo_projetos(revisao, _df_obras):
+    with metricas.medir("catalogo_projetos.montar", obras=len(_df_obras)):
+        return catalogo.CatalogoProjetos(_df_obras)
+
+def carregar_catalogo_projetos():
+    df_obras = carregar_obras()
+    return _catalogo_projetos(df_obras.attrs['versao'], df_obras)
+
+# --- FUSO E DATA DE HOJE ---
+FUSO_BR = pytz.timezone('America/Sao_Paulo')
+
+def get_hoje():
+    return datetime.now(FUSO_BR).date()
+
+# --- ARQUIVO DE ATIVIDADES ANTIGAS ---
+# Atividades que terminaram há mais de DIAS_ARQUIVAMENTO dias saem da Agenda viva (que é
+# lida e gravada a todo momento) para a aba "Arquivo". Como só se arquiva o que terminou
+# antes de limite_arquivo(hoje), o arquivo só precisa ser lido quando o zoom passa desse limite.
+
+DIAS_ARQUIVAMENTO = 90
+
+def limite_arquivo(hoje):
+    return hoje - timedelta(days=DIAS_ARQUIVAMENTO)
+
+def ids_para_arquivar(df_agenda, hoje):
+    # df_agenda tipada; atividades sem data de fim válida ficam na Agenda
+    limite = pd.Timestamp(limite_arquivo(hoje))
+    antigas = df_agenda['Data Fim'] < limite
+    ids = df_agenda.loc[antigas, COLUNA_ID].astype(str) if COLUNA_ID in df_agenda.columns else pd.Series(dtype=str)
+    return [i for i in ids if not _id_vazio(i)]
+
+def arquivar_antigas(hoje):
+    # Lê a Agenda direto da origem (não do cache) para decidir o que mover. A fila é gravada
+    # antes; o que continuar nela (falhou ou chegou agora) fica para a próxima vez, senão o
+    # upsert por ID devolveria à Agenda uma atividade que já foi para o arquivo
+    backend = obter_armazenamento()
+    fila = obter_fila()
+    fila.processar()
+    pendentes = {op['id'] for op in fila.nao_sincronizadas()}
+    ids = [i for i in ids_para_arquivar(normalizar_agenda(backend.carregar_agenda()), hoje) if i not in pendentes]
+    if not ids:
+        return 0
+    with metricas.medir("arquivar", atividades=len(ids)):
+        movidas = backend.arquivar(ids)
+    recarregar('agenda')
+    invalidar('arquivo')
+    return movidas
+
+def carregar_arquivo():
+    # Só é chamado quando o zoom alcança períodos arquivados (a primeira leitura espera)
+    df_arquivo = _obter_conjunto('arquivo')
+    return _normalizar_em_cache(df_arquivo.attrs['versao'], df_arquivo)
+
+def invalidar(*conjuntos):
+    # Sem argumentos invalida tudo (inclusive o arquivo): a próxima leitura espera a recarga
+    for nome in conjuntos or _conjuntos():
+        _conjuntos()[nome].descartar()
+        metricas.contar(f"cache.{nome}.invalidacoes")
+
+def recarregar(*conjuntos):
+    # Recarga imediata com a revisão atual (ex.: depois de uma gravação nossa, para a tela
+    # não voltar ao valor antigo entre o fim da gravação e a próxima verificação). A verificação
+    # não recarrega estes conjuntos de novo nem os que só dividem a revisão com eles
+    atuais = _monitor_revisoes().verificar(proprios=conjuntos or CARREGADORES)
+    for nome in conjuntos or CARREGADORES:
+        _conjuntos()[nome].recarregar(_revisao(nome, atuais))
+
+def _com_contexto(nome, funcao, ctx):
+    # Threads auxiliares precisam do contexto do script para usar o cache do Streamlit
+    def executar():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        metricas.acesso_cache(nome)
+        t0 = time.perf_counter()
+        resultado = funcao()
+        return resultado, time.perf_counter() - t0
+    return executar
+
+def carregar_dados():
+    inicio = time.perf_counter()
+    ctx = get_script_run_ctx()
+
+    # Conjuntos frios são buscados em paralelo; os que estão em cache retornam na hora
+    with ThreadPoolExecutor(max_workers=len(CARREGADORES)) as executor:
+        futuros = {nome: executor.submit(_com_contexto(nome, funcao, ctx)) for nome, funcao in CARREGADORES.items()}
+        resultados = {nome: futuro.result() for nome, futuro in futuros.items()}
+
+    tempos = {nome: duracao for nome, (_, duracao) in resultados.items()}
+    tempos['total'] = time.perf_counter() - inicio
+    metricas.registrar("carregar_dados", tempos['total'])
+    df_agenda, df_frota, df_time, df_obras = (resultados[nome][0] for nome in CARREGADORES)
+    return _agenda_normalizada(df_agenda), df_frota, df_time, df_obras, tempos
+
+# --- MODELO TIPADO DA AGENDA ---
+# Datas em datetime64, Projeto como texto limpo e colunas repetitivas como categoria.
+# Normalizado uma vez por versão dos dados; gravado sempre no mesmo formato de data.
+
+COLUNAS_DATA = armazenamento.COLUNAS_DATA
+COLUNAS_CATEGORIA = ['Cliente', 'Veículo', 'Status']
+FORMATO_DATA = '%d/%m/%Y'
+
+def limpar_codigo_projeto(serie):
+    # Códigos lidos como número chegam como "1234.0"
+    return serie.fillna("").astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+
+def normalizar_agenda(df_raw):
+    df = df_raw.copy()
+    for col in COLUNAS_DATA:
+        if col in df.columns:
+            df[col] = armazenamento.converter_datas(df[col])
+    if 'Projeto' in df.columns:
+        df['Projeto'] = limpar_codigo_projeto(df['Projeto'])
+    for col in df.columns:
+        if col in COLUNAS_DATA:
+            continue
+        df[col] = df[col].map(_texto_celula).astype(object)
+        if col in COLUNAS_CATEGORIA:
+            df[col] = df[col].astype('category')
+    return df
+
+@cache_por_versao('agenda_normalizada', max_entries=8)
+def _normalizar_em_cache(versao, _df_raw, _operacoes=()):
+    # Chave: versão da carga (+ pendências da fila). O DataFrame não entra no hash: com
+    # dezenas de milhares de linhas o Streamlit só amostra o frame e o resultado ficaria velho
+    with metricas.medir("conexao.normalizar_agenda"):
+        df = normalizar_agenda(_com_pendentes(_df_raw, _operacoes))
+    # A versão vai junto (attrs): derivados memoizam por ela
+    df.attrs['versao'] = versao
+    return df
+
+def _chave_pendentes(operacoes):
+    # Operações não mudam depois de enfileiradas: os números de sequência identificam o conjunto
+    if not operacoes:
+        return ""
+    return hashlib.sha1(",".join(str(op['seq']) for op in operacoes).encode()).hexdigest()[:16]
+
+def _agenda_normalizada(df_agenda):
+    operacoes = obter_fila().nao_sincronizadas()
+    versao = f"{df_agenda.attrs['versao']}+{_chave_pendentes(operacoes)}"
+    return _normalizar_em_cache(versao, df_agenda, operacoes)
+
+def versao_dados(*dfs):
+    # Versão combinada de frames vindos dos carregadores (None se algum não tiver)
+    versoes = tuple(df.attrs.get('versao') for df in dfs)
+    return None if None in versoes else versoes
+
+def carregar_agenda_normalizada():
+    return _agenda_normalizada(carregar_agenda())
+
+def serializar_agenda(df):
+    # Formato único gravado na planilha: datas dd/mm/aaaa e demais colunas como texto
+    df = df.copy()
+    for col in df.columns:
+        if col in COLUNAS_DATA:
+            datas = df[col]
+            if not pd.api.types.is_datetime64_any_dtype(datas):
+                datas = armazenamento.converter_datas(datas)
+            df[col] = datas.dt.strftime(FORMATO_DATA).fillna("").astype(object)
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object).fillna("")
+    if 'Projeto' in df.columns:
+        df['Projeto'] = limpar_codigo_projeto(df['Projeto']).astype(object)
+    return df.fillna("")
+
+# --- ATRIBUIÇÕES (EXECUTANTES / VEÍCULO) ---
+# Derivada da Agenda tipada, junto com ela: pessoas codificadas pelo cadastro de Time e
+# veículos pelo de Frota. Filtros e o modal de edição consultam arrays, não o texto da coluna.
+
+def lista_veiculos(df_frota):
+    col_veic = 'Veículo' if 'Veículo' in df_frota.columns else 'Placa'
+    return df_frota[col_veic].dropna().unique().tolist() if col_veic in df_frota.columns else []
+
+def lista_pessoas(df_time):
+    return df_time['Nome'].dropna().unique().tolist() if 'Nome' in df_time.columns else []
+
+@cache_por_versao('atribuicoes')
+def _atribuicoes_em_cache(versao, _df_agenda, _df_time, _df_frota):
+    # Chave: versões da Agenda, do Time e da Frota
+    with metricas.medir("conexao.montar_atribuicoes", linhas=len(_df_agenda)):
+        return atribuicoes.TabelaAtribuicoes(_df_agenda, lista_pessoas(_df_time), lista_veiculos(_df_frota))
+
+def carregar_atribuicoes(df_agenda, df_time, df_frota):
+    # df_agenda: a mesma Agenda tipada de carregar_dados() (rótulos de linha iguais)
+    return _atribuicoes_em_cache(versao_dados(df_agenda, df_time, df_frota), df_agenda, df_time, df_frota)
+
+# --- GRAVAÇÃO INCREMENTAL ---
+
+def gerar_id():
+    # Começa com letra: a leitura da planilha (numericise) nunca o transforma em número
+    # ("012345678901" -> 12345678901, "12e345678901" -> inf). O uuid4 inteiro (122 bits
+    # aleatórios) torna colisão entre sessões gerando IDs ao mesmo tempo desprezível
+    return "a" + uuid.uuid4().hex
+
+def _id_vazio(valor):
+    if valor is None:
+        return True
+    try:
+        if pd.isna(valor):
+            return True
+    except (TypeError, ValueError):
+        pass
+    return str(valor).strip() == ""
+
+def garantir_ids(df):
+    # Preenche a coluna ID das linhas novas (ex.: criadas no data_editor ou no modal)
+    df = df.copy()
+    if COLUNA_ID not in df.columns:
+        df[COLUNA_ID] = ""
+    vazios = df[COLUNA_ID].map(_id_vazio)
+    if vazios.any():
+        df[COLUNA_ID] = df[COLUNA_ID].astype(object)
+        df.loc[vazios, COLUNA_ID] = [gerar_id() for _ in range(int(vazios.sum()))]
+    df[COLUNA_ID] = df[COLUNA_ID].astype(str)
+    return df
+
+def _valor_celula(valor):
+    # Normaliza o valor como ele é gravado/lido da planilha (RAW)
+    if valor is None:
+        return ""
+    try:
+        if pd.isna(valor):
+            return ""
+    except (TypeError, ValueError):
+        pass
+    if hasattr(valor, 'item') and not isinstance(valor, str):
+        valor = valor.item()
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, (bool, int, float, str)):
+        return valor
+    return str(valor)
+
+def _texto_celula(valor):
+    return str(_valor_celula(valor))
+
+def _celula_api(valor):
+    valor = _valor_celula(valor)
+    if isinstance(valor, bool):
+        return {"userEnteredValue": {"boolValue": valor}}
+    if isinstance(valor, (int, float)):
+        return {"userEnteredValue": {"numberValue": valor}}
+    return {"userEnteredValue": {"stringValue": valor}}
+
+def _letra_coluna(numero):
+    letras = ""
+    while numero > 0:
+        numero, resto = divmod(numero - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+def _base_valida(df_base, colunas):
+    if df_base is None or COLUNA_ID not in colunas:
+        return False
+    if list(df_base.columns) != colunas:
+        return False
+    ids = df_base[COLUNA_ID]
+    return not ids.map(_id_vazio).any() and not ids.astype(str).duplicated().any()
+
+def montar_requisicoes_diff(df_novo, df_base, ids_planilha, sheet_id):
+    # Compara df_novo com o snapshot pela coluna ID e devolve as requisições do batchUpdate.
+    # ids_planilha: lista com a coluna ID atual da planilha (posição 0 = cabeçalho).
+    colunas = list(df_novo.columns)
+    linha_por_id = {str(v): i for i, v in enumerate(ids_planilha) if i > 0 and str(v) != ""}
+
+    novo = df_novo.set_index(df_novo[COLUNA_ID].astype(str))
+    base = df_base.set_index(df_base[COLUNA_ID].astype(str))
+
+    comuns = novo.index.intersection(base.index)
+    comuns = comuns[comuns.isin(list(linha_por_id))]
+    # Novas para o snapshot mas já na planilha (ex.: gravação anterior aplicada apesar do
+    # timeout): a linha inteira é sobrescrita no lugar, nunca acrescentada de novo
+    ja_gravados = novo.index.difference(base.index, sort=False)
+    ja_gravados = ja_gravados[ja_gravados.isin(list(linha_por_id))]
+    novos = novo.index.difference(comuns.append(ja_gravados), sort=False)
+    removidos = base.index.difference(novo.index, sort=False)
+
+    requisicoes = []
+
+    # 1. Células alteradas (posições ainda válidas: as exclusões vêm depois)
+    if len(comuns):
+        texto_novo = novo.loc[comuns, colunas].apply(lambda c: c.map(_texto_celula)).to_numpy()
+        texto_base = base.loc[comuns, colunas].apply(lambda c: c.map(_texto_celula)).to_numpy()
+        valores_novos = novo.loc[comuns, colunas].to_numpy()
+        # Células vizinhas alteradas na mesma linha viram um só trecho (uma requisição)
+        trechos = []
+        for i, j in zip(*(texto_novo != texto_base).nonzero()):
+            if trechos and trechos[-1][0] == i and trechos[-1][2] == j:
+                trechos[-1][2] = j + 1
+            else:
+                trechos.append([i, j, j + 1])
+        for i, inicio, fim in trechos:
+            linha = linha_por_id[comuns[i]]
+            requisicoes.append({
+                "updateCells": {
+                    "range": {"sheetId": sheet_id, "startRowIndex": linha, "endRowIndex": linha + 1,
+                              "startColumnIndex": int(inicio), "endColumnIndex": int(fim)},
+                    "rows": [{"values": [_celula_api(v) for v in valores_novos[i][inicio:fim]]}],
+                    "fields": "userEnteredValue"
+                }
+            })
+
+    for id_atividade in ja_gravados:
+        linha = linha_por_id[id_atividade]
+        requisicoes.append({
+            "updateCells": {
+                "range": {"sheetId": sheet_id, "startRowIndex": linha, "endRowIndex": linha + 1,
+                          "startColumnIndex": 0, "endColumnIndex": len(colunas)},
+                "rows": [{"values": [_celula_api(v) for v in novo.loc[id_atividade, colunas]]}],
+                "fields": "userEnteredValue"
+            }
+        })
+
+    # 2. Linhas excluídas, de baixo para cima
+    linhas_excluir = sorted((linha_por_id[i] for i in removidos if i in linha_por_id), reverse=True)
+    for linha in linhas_excluir:
+        requisicoes.append({
+            "deleteDimension": {
+                "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": linha, "endIndex": linha + 1}
+            }
+        })
+
+    # 3. Linhas novas no final
+    if len(novos):
+        linhas = novo.loc[novos, colunas].to_numpy().tolist()
+        requisicoes.append({
+            "appendCells": {
+                "sheetId": sheet_id,
+                "rows": [{"values": [_celula_api(v) for v in linha]} for linha in linhas],
+                "fields": "userEnteredValue"
+            }
+        })
+
+    return requisicoes
+
+REFAZER_DIFF = 2  # Releituras da planilha depois de uma gravação com falha transitória
+
+def _cabecalho_e_ids(ws, colunas):
+    # Cabeçalho e coluna ID atuais da aba (posição 0 = cabeçalho), numa só leitura
+    letra_id = _letra_coluna(colunas.index(COLUNA_ID) + 1)
+    cabecalho, coluna_ids = ws.batch_get(["1:1", f"{letra_id}:{letra_id}"])
+    cabecalho = cabecalho[0] if cabecalho else []
+    return cabecalho, [linha[0] if linha else "" for linha in coluna_ids]
+
+def _regravar_planilha(ws, df_novo):
     ws.clear()
     ws.update([df_novo.columns.values.tolist()] + df_novo.values.tolist())
-    st.cache_data.clear()
+
+def salvar_no_sheets(df_novo, df_base=None):
+    # Grava a Agenda no backend configurado (nome mantido por compatibilidade).
+    # df_base é o snapshot cru (como está na planilha): células fora do formato
+    # padrão aparecem como alteradas e são regravadas.
+    df_novo = serializar_agenda(garantir_ids(df_novo))
+    if df_base is None:
+        df_base = carregar_agenda()
+    with metricas.medir("salvar_no_sheets", linhas=len(df_novo)):
+        obter_armazenamento().salvar_agenda(df_novo, df_base)
+    recarregar('agenda')
+
+# --- FILA DE GRAVAÇÃO (WRITE-BEHIND) ---
+# Os botões de salvar só enfileiram as atividades alteradas e voltam na hora. O que ainda
+# não foi gravado é sobreposto à Agenda carregada, então a tela já mostra a alteração.
+
+def aplicar_operacoes(df, atividades, exclusoes):
+    # Upserts por ID (só os campos informados) + exclusões, sem mexer nas demais linhas
+    df = df.copy()
+    if COLUNA_ID not in df.columns:
+        df[COLUNA_ID] = ""
+    ids = df[COLUNA_ID].astype(str)
+    if exclusoes:
+        manter = ~ids.isin([str(i) for i in exclusoes])
+        df, ids = df[manter], ids[manter]
+    posicao = {id_atividade: rotulo for rotulo, id_atividade in ids.items()}
+    novas = []
+    for atividade in atividades:
+        rotulo = posicao.get(str(atividade[COLUNA_ID]))
+        if rotulo is None:
+            novas.append(atividade)
+            continue
+        for col, valor in atividade.items():
+            if col not in df.columns:
+                df[col] = ""
+            if df[col].dtype != object:
+                df[col] = df[col].astype(object)
+            df.at[rotulo, col] = valor
+    if novas:
+        df = pd.concat([df, pd.DataFrame(novas)], ignore_index=True)
+    return df
+
+@st.cache_resource
+def obter_fila():
+    # Uma fila por processo, com diário em .cache/ (sobrevive a restart)
+    backend = obter_armazenamento()
+    return fila_gravacao.FilaGravacao(
+        os.path.join(PASTA_CACHE, "fila_gravacao.db"),
+        aplicar=backend.aplicar_alteracoes,
+        ao_sincronizar=lambda: recarregar('agenda')
+    )
+
+def _com_pendentes(df_raw, operacoes):
+    # Sobreposição otimista: a Agenda como ficará depois que a fila gravar
+    # (operacoes: obter_fila().nao_sincronizadas())
+    if not operacoes:
+        return df_raw
+    atividades, exclusoes = fila_gravacao.consolidar_operacoes(operacoes)
+    return aplicar_operacoes(df_raw, list(atividades.values()), exclusoes)
+
+def _tem_ids(df):
+    if COLUNA_ID not in df.columns:
+        return False
+    return not df[COLUNA_ID].map(_id_vazio).any() and not df[COLUNA_ID].astype(str).duplicated().any()
+
+def operacoes_diff(df_novo, df_base):
+    # Atividades novas/alteradas (linha inteira, já serializada) e excluídas, comparando por ID
+    novo = serializar_agenda(garantir_ids(df_novo))
+    base = serializar_agenda(df_base)
+    colunas = list(novo.columns)
+    texto_novo = novo.set_index(novo[COLUNA_ID]).map(_texto_celula)
+    texto_base = base.set_index(base[COLUNA_ID].astype(str)).map(_texto_celula)
+    texto_base = texto_base.reindex(columns=colunas)
+
+    existentes = texto_novo.index.isin(texto_base.index)
+    alteradas = ~existentes
+    if existentes.any():
+        comparacao = texto_base.reindex(texto_novo.index[existentes]).fillna("").to_numpy()
+        alteradas[existentes] = (texto_novo[existentes].to_numpy() != comparacao).any(axis=1)
+
+    operacoes = [(fila_gravacao.EXCLUIR, id_atividade, None)
+                 for id_atividade in texto_base.index.difference(texto_novo.index, sort=False)]
+    for registro in novo[alteradas].to_dict('records'):
+        operacoes.append((fila_gravacao.SALVAR, registro[COLUNA_ID],
+                          {col: _valor_celula(valor) for col, valor in registro.items()}))
+    return operacoes
+
+def enfileirar_gravacao(df_novo, df_base):
+    # df_base: a Agenda que o usuário estava vendo (com as pendências já sobrepostas).
+    # Retorna quantas operações entraram na fila (None se gravou direto)
+    if not _tem_ids(df_base):
+        # Planilha ainda sem IDs: grava direto (a primeira gravação cria a coluna ID)
+        salvar_no_sheets(df_novo)
+        return None
+    operacoes = operacoes_diff(df_novo, df_base)
+    obter_fila().enfileirar(operacoes)
+    return len(operacoes)
+
+# --- BACKENDS DE ARMAZENAMENTO ---
+
+class ArmazenamentoGoogle(armazenamento.Armazenamento):
+    REVISAO_COMPARTILHADA = (('agenda', 'frota', 'time', 'arquivo'),)
+    # Planilha Google (Agenda/Frota/Time) + Excel de Obras no Drive.
+    # planilha/drive_service podem ser injetados (ex.: clientes locais do benchmark).
+
+    def __init__(self, planilha=None, drive_service=None):
+        self._planilha = planilha
+        self._drive_service = drive_service
+
+    def planilha(self):
+        return self._planilha if self._planilha is not None else abrir_planilha()
+
+    def drive(self):
+        return self._drive_service if self._drive_service is not None else conectar_apis()[1]
+
+    def revisoes(self):
+        # Uma busca no Drive traz a versão da planilha (todas as abas) e a do Excel de Obras
+        nomes = " or ".join(f"name = '{nome}'" for nome in (SHEET_NAME, EXCEL_FILE_NAME))
+        resultado = self.drive().files().list(
+            q=f"({nomes}) and trashed = false", fields="files(name, version, modifiedTime)"
+        ).execute()
+        versoes = {f['name']: f.get('version') or f.get('modifiedTime') for f in resultado.get('files', [])}
+        planilha = versoes.get(SHEET_NAME)
+        return {'agenda': planilha, 'frota': planilha, 'time': planilha, 'arquivo': planilha,
+                'obras': versoes.get(EXCEL_FILE_NAME)}
+
+    def carregar_agenda(self):
+        return _ler_abas(self.planilha(), ["Agenda"])[0]
+
+    def carregar_frota(self):
+        return _ler_abas(self.planilha(), ["Frota"])[0]
+
+    def carregar_time(self):
+        return _ler_abas(self.planilha(), ["Time"])[0]
+
+    def carregar_obras(self):
+        return _baixar_obras(self.drive())
+
+    def salvar_agenda(self, df_novo, df_base=None):
+        sh = self.planilha()
+        ws = sh.worksheet("Agenda")
+
+        colunas = list(df_novo.columns)
+        if not _base_valida(df_base, colunas) or df_novo[COLUNA_ID].duplicated().any():
+            # Fallback: estrutura mudou (ou a planilha ainda não tem IDs) -> regrava tudo
+            metricas.contar("salvar.regravacao_completa")
+            _regravar_planilha(ws, df_novo)
+            return
+
+        import cliente_google
+        for tentativa in range(REFAZER_DIFF + 1):
+            # Posições lidas na hora: depois de uma falha o diff é refeito sobre a planilha atual
+            cabecalho, ids_planilha = _cabecalho_e_ids(ws, colunas)
+            if cabecalho != colunas:
+                metricas.contar("salvar.regravacao_completa")
+                _regravar_planilha(ws, df_novo)
+                return
+
+            requisicoes = montar_requisicoes_diff(df_novo, df_base, ids_planilha, ws.id)
+            metricas.contar("salvar.requisicoes_diff", len(requisicoes))
+            if not requisicoes:
+                return
+            try:
+                sh.batch_update({"requests": requisicoes})
+                return
+            except Exception as e:
+                # Timeout/5xx: o lote pode ter sido aplicado ou não; repetir a mesma requisição
+                # duplicaria acréscimos e apagaria linhas erradas
+                if tentativa == REFAZER_DIFF or not cliente_google.falha_transitoria(e):
+                    raise
+                metricas.contar("salvar.diff_refeito")
+
+    def carregar_arquivo(self):
+        from gspread.exceptions import APIError
+        try:
+            return _ler_abas(self.planilha(), [ABA_ARQUIVO])[0]
+        except APIError as e:
+            if e.response.status_code == 400:
+                return pd.DataFrame()  # Aba ainda não existe (nada arquivado)
+            raise
+
+    def _aba_arquivo(self, sh, colunas):
+        # Aba de arquivo com cabeçalho; criada no primeiro arquivamento
+        from gspread.exceptions import WorksheetNotFound
+        try:
+            ws = sh.worksheet(ABA_ARQUIVO)
+            cabecalho = ws.row_values(1)
+        except WorksheetNotFound:
+            ws = sh.add_worksheet(ABA_ARQUIVO, rows=1, cols=len(colunas))
+            cabecalho = []
+        extras = [c for c in colunas if c not in cabecalho]
+        if extras:
+            if len(cabecalho) + len(extras) > ws.col_count:
+                ws.add_cols(len(cabecalho) + len(extras) - ws.col_count)
+            cabecalho = cabecalho + extras
+            ws.update([cabecalho], "A1")
+        return ws, cabecalho
+
+    def arquivar(self, ids):
+        # Um único batchUpdate (atômico): acrescenta no Arquivo e apaga da Agenda
+        sh = self.planilha()
+        ws = sh.worksheet("Agenda")
+        df_base = self.carregar_agenda()
+        colunas = list(df_base.columns)
+        if not _base_valida(df_base, colunas):
+            raise ValueError("A Agenda precisa da coluna ID preenchida para arquivar (salve a Agenda uma vez).")
+        mover = df_base[COLUNA_ID].astype(str).isin({str(i) for i in ids})
+        if not mover.any():
+            return 0
+
+        cabecalho, ids_planilha = _cabecalho_e_ids(ws, colunas)
+        if cabecalho != colunas:
+            raise ValueError("O cabeçalho da Agenda mudou durante o arquivamento; tente de novo.")
+        ws_arquivo, cabecalho_arquivo = self._aba_arquivo(sh, colunas)
+        linhas = df_base[mover].reindex(columns=cabecalho_arquivo).fillna("").to_numpy().tolist()
+        requisicoes = [{
+            "appendCells": {
+                "sheetId": ws_arquivo.id,
+                "rows": [{"values": [_celula_api(v) for v in linha]} for linha in linhas],
+                "fields": "userEnteredValue"
+            }
+        }]
+        requisicoes += montar_requisicoes_diff(df_base[~mover], df_base, ids_planilha, ws.id)
+        sh.batch_update({"requests": requisicoes})
+        return len(linhas)
+
+    def salvar_atividade(self, atividade):
+        self.aplicar_alteracoes([atividade], [])
+
+    def excluir_atividade(self, id_atividade):
+        self.aplicar_alteracoes([], [id_atividade])
+
+    def aplicar_alteracoes(self, atividades, exclusoes):
+        # Lê a Agenda atual uma vez e grava o lote num único batchUpdate (diff por ID)
+        df_base = self.carregar_agenda()
+        df_novo = aplicar_operacoes(garantir_ids(df_base), atividades, exclusoes)
+        self.salvar_agenda(df_novo.fillna(""), df_base)
+
+def _config_armazenamento():
+    try:
+        config = dict(st.secrets.get("armazenamento", {}))
+    except Exception:
+        config = {}  # Sem secrets.toml (ex.: execução offline)
+    config['backend'] = os.environ.get("PLANEJAMENTO_BACKEND", config.get('backend', "google"))
+    return config
+
+@st.cache_resource
+def obter_armazenamento():
+    # [armazenamento] no secrets.toml:
+    #   backend = "google" | "sqlite" | "replica"
+    #   caminho = ".cache/planejamento.db"   (sqlite/replica)
+    #   intervalo_sync = 300                 (replica, em segundos)
+    config = _config_armazenamento()
+    backend = config['backend']
+    caminho = config.get('caminho', os.path.join(PASTA_CACHE, "planejamento.db"))
+    if backend == "google":
+        return ArmazenamentoGoogle()
+    if backend == "sqlite":
+        return armazenamento.ArmazenamentoSQLite(caminho)
+    if backend == "replica":
+        return armazenamento.ArmazenamentoReplica(
+            armazenamento.ArmazenamentoSQLite(caminho),
+            ArmazenamentoGoogle(),
+            intervalo=int(config.get('intervalo_sync', 300))
+        )
+    raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
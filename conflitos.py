@@ -0,0 +1,84 @@
+import heapq
+import pandas as pd
+from atribuicoes import PESSOA, VEICULO
+from intervalos import IndiceIntervalos
+
+# --- CONFLITOS DE RECURSOS (EXECUTANTES / VEÍCULO) ---
+# Parte da TabelaAtribuicoes (uma linha por atividade e recurso, já codificada): aqui só se
+# juntam as datas. A verificação nos modais usa um índice de intervalos por recurso; o
+# relatório completo usa varredura (sweep line).
+
+ROTULOS_TIPO = {PESSOA: "Pessoa", VEICULO: "Veículo"}
+
+def atribuicoes_com_datas(tabela, df_agenda):
+    # tabela: TabelaAtribuicoes de df_agenda (datas em datetime64).
+    # Retorna (tipo, recurso, rotulo, inicio, fim) com o recurso como código inteiro
+    pares = tabela.tabela()
+    datas = df_agenda[['Data Início', 'Data Fim']].reindex(pares['linha'].to_numpy())
+    atribuicoes = pd.DataFrame({
+        'tipo': pares['tipo'].to_numpy(),
+        'recurso': pares['recurso'].to_numpy(),
+        'rotulo': pares['linha'].to_numpy(),
+        'inicio': datas['Data Início'].to_numpy(),
+        'fim': datas['Data Fim'].to_numpy(),
+    })
+    return atribuicoes.dropna(subset=['inicio', 'fim']).reset_index(drop=True)
+
+
+class AgendaRecursos:
+    # Um IndiceIntervalos por (tipo, recurso): checar uma atividade nova é O(log n) por recurso
+
+    def __init__(self, atribuicoes, nomes):
+        self.nomes = nomes
+        self.indices = {
+            chave: IndiceIntervalos(grupo['inicio'], grupo['fim'], grupo['rotulo'])
+            for chave, grupo in atribuicoes.groupby(['tipo', 'recurso'], sort=False)
+        }
+
+    def verificar(self, tipo, recursos, inicio, fim, ignorar=None):
+        # Lista de (recurso, rótulo da atividade) que já ocupam o recurso no período
+        conflitos = []
+        for recurso in recursos:
+            codigo = self.nomes[tipo].get_indexer([recurso])[0]
+            indice = self.indices.get((tipo, codigo))
+            if indice is None:
+                continue
+            for rotulo in indice.consultar(inicio, fim):
+                if rotulo != ignorar:
+                    conflitos.append((recurso, rotulo))
+        return conflitos
+
+
+def detectar_conflitos(atribuicoes, nomes):
+    # Varredura por recurso, ordenada pelo início: O(n log n + k) para k sobreposições.
+    # Saída com o tipo como código (ROTULOS_TIPO) e o recurso pelo nome
+    colunas = ['tipo', 'recurso', 'atividade_a', 'atividade_b', 'inicio', 'fim']
+    if atribuicoes.empty:
+        return pd.DataFrame(columns=colunas)
+
+    ordenadas = atribuicoes.sort_values(['tipo', 'recurso', 'inicio'], kind='stable')
+    tipos = ordenadas['tipo'].to_numpy()
+    recursos = ordenadas['recurso'].to_numpy()
+    rotulos = ordenadas['rotulo'].to_numpy()
+    inicios = ordenadas['inicio'].to_numpy(dtype='datetime64[ns]')
+    fins = ordenadas['fim'].to_numpy(dtype='datetime64[ns]')
+
+    encontrados = []
+    ativos = []
+    chave_atual = None
+    for i in range(len(ordenadas)):
+        chave = (tipos[i], recursos[i])
+        if chave != chave_atual:
+            chave_atual, ativos = chave, []
+        # Datas são dias inteiros: quem termina antes do início de i já liberou o recurso
+        while ativos and ativos[0][0] < inicios[i]:
+            heapq.heappop(ativos)
+        if fins[i] < inicios[i]:
+            continue  # Fim antes do início (erro de digitação): não ocupa nenhum dia
+        for fim_ativo, j in ativos:
+            if rotulos[j] != rotulos[i]:
+                encontrados.append((tipos[i], nomes[tipos[i]][recursos[i]], rotulos[j], rotulos[i],
+                                    inicios[i], min(fim_ativo, fins[i])))
+        heapq.heappush(ativos, (fins[i], i))
+
+    return pd.DataFrame(encontrados, columns=colunas)
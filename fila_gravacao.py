@@ -0,0 +1,203 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import metricas
+
+# --- FILA DE GRAVAÇÃO (WRITE-BEHIND) ---
+# Alterações por atividade vão para um diário local (SQLite) e voltam na hora para a tela.
+# Uma thread junta as rajadas de cliques e aplica tudo num único lote no backend.
+# O diário sobrevive a um restart: o que ficou pendente é reaplicado ao subir o processo
+# (salvar/excluir por ID são idempotentes).
+
+SALVAR = "salvar"
+EXCLUIR = "excluir"
+
+PENDENTE = "pendente"
+SINCRONIZADO = "sincronizado"
+FALHOU = "falhou"
+
+ESPERA_LOTE = 2.0          # segundos juntando cliques antes de gravar
+ESPERA_RETENTATIVA = 15.0  # primeira nova tentativa após falha (dobra a cada erro)
+ESPERA_MAXIMA = 300.0
+RETENCAO_SINCRONIZADOS = 24 * 3600
+
+
+def consolidar_operacoes(operacoes):
+    # Reduz a sequência a um estado final por ID: {id: campos} para salvar + ids para excluir
+    atividades = {}
+    exclusoes = set()
+    for op in operacoes:
+        id_atividade = op['id']
+        if op['tipo'] == EXCLUIR:
+            atividades.pop(id_atividade, None)
+            exclusoes.add(id_atividade)
+        else:
+            exclusoes.discard(id_atividade)
+            atividades[id_atividade] = {**atividades.get(id_atividade, {}), **op['dados']}
+    return atividades, exclusoes
+
+
+class FilaGravacao:
+    # aplicar(atividades, exclusoes): grava um lote no backend (lista de dicts, lista de IDs)
+    # ao_sincronizar(): chamado depois de um lote gravado (ex.: invalidar o cache da Agenda)
+
+    def __init__(self, caminho, aplicar, ao_sincronizar=None, espera=ESPERA_LOTE):
+        self.caminho = caminho
+        self.aplicar = aplicar
+        self.ao_sincronizar = ao_sincronizar
+        self.espera = espera
+        self._lock = threading.Lock()
+        self._lock_lote = threading.Lock()
+        self._evento = threading.Event()
+        self._falhas_seguidas = 0
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with self._conectar() as con, con:
+            con.executescript("""
+                CREATE TABLE IF NOT EXISTS operacoes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id_atividade TEXT NOT NULL,
+                    tipo TEXT NOT NULL,
+                    dados TEXT,
+                    estado TEXT NOT NULL,
+                    erro TEXT,
+                    criado_em REAL NOT NULL,
+                    atualizado_em REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_operacoes_estado ON operacoes (estado);
+            """)
+
+        self._thread = threading.Thread(target=self._trabalhar, name="fila-gravacao", daemon=True)
+        self._thread.start()
+        if self.estado()['pendentes']:
+            self._evento.set()  # Sobrou trabalho da execução anterior
+
+    def _conectar(self):
+        return closing(sqlite3.connect(self.caminho, timeout=30))
+
+    # --- Entrada ---
+
+    def enfileirar(self, operacoes):
+        # operacoes: lista de (tipo, id_atividade, dados) -- dados só para SALVAR
+        if not operacoes:
+            return
+        agora = time.time()
+        with self._lock, self._conectar() as con, con:
+            con.executemany(
+                "INSERT INTO operacoes (id_atividade, tipo, dados, estado, criado_em, atualizado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(str(id_atividade), tipo, json.dumps(dados, ensure_ascii=False) if dados is not None else None,
+                  PENDENTE, agora, agora) for tipo, id_atividade, dados in operacoes]
+            )
+        metricas.contar("fila.operacoes", len(operacoes))
+        self._evento.set()
+
+    # --- Consulta ---
+
+    def _ler(self, estados):
+        marcadores = ", ".join("?" for _ in estados)
+        with self._conectar() as con:
+            linhas = con.execute(
+                f"SELECT seq, id_atividade, tipo, dados FROM operacoes WHERE estado IN ({marcadores}) ORDER BY seq",
+                tuple(estados)
+            ).fetchall()
+        return [{'seq': seq, 'id': id_atividade, 'tipo': tipo, 'dados': json.loads(dados) if dados else {}}
+                for seq, id_atividade, tipo, dados in linhas]
+
+    def nao_sincronizadas(self):
+        # Operações ainda não gravadas no backend (inclui as que falharam), na ordem de chegada
+        return self._ler((PENDENTE, FALHOU))
+
+    def estado(self):
+        with self._conectar() as con:
+            contagem = dict(con.execute(
+                "SELECT estado, COUNT(*) FROM operacoes WHERE estado IN (?, ?) GROUP BY estado", (PENDENTE, FALHOU)
+            ).fetchall())
+            erro = con.execute(
+                "SELECT erro FROM operacoes WHERE estado = ? ORDER BY seq DESC LIMIT 1", (FALHOU,)
+            ).fetchone()
+            sincronizado = con.execute(
+                "SELECT MAX(atualizado_em) FROM operacoes WHERE estado = ?", (SINCRONIZADO,)
+            ).fetchone()
+        falhas = contagem.get(FALHOU, 0)
+        return {
+            'pendentes': contagem.get(PENDENTE, 0) + falhas,
+            'falhas': falhas,
+            'ultimo_erro': erro[0] if erro else None,
+            'sincronizado_em': sincronizado[0] if sincronizado else None,
+        }
+
+    # --- Ações da interface ---
+
+    def tentar_novamente(self):
+        self._falhas_seguidas = 0
+        self._evento.set()
+
+    def descartar_falhas(self):
+        with self._lock, self._conectar() as con, con:
+            con.execute("DELETE FROM operacoes WHERE estado = ?", (FALHOU,))
+
+    # --- Gravação em segundo plano ---
+
+    def _marcar(self, seqs, estado, erro=None):
+        marcadores = ", ".join("?" for _ in seqs)
+        agora = time.time()
+        with self._lock, self._conectar() as con, con:
+            con.execute(f"UPDATE operacoes SET estado = ?, erro = ?, atualizado_em = ? WHERE seq IN ({marcadores})",
+                        (estado, erro, agora, *seqs))
+            if estado == SINCRONIZADO:
+                con.execute("DELETE FROM operacoes WHERE estado = ? AND atualizado_em < ?",
+                            (SINCRONIZADO, agora - RETENCAO_SINCRONIZADOS))
+
+    def _proxima_tentativa(self):
+        if not self._falhas_seguidas:
+            return None
+        return min(ESPERA_RETENTATIVA * 2 ** (self._falhas_seguidas - 1), ESPERA_MAXIMA)
+
+    def _trabalhar(self):
+        while True:
+            if self._evento.wait(self._proxima_tentativa()):
+                time.sleep(self.espera)  # Junta os cliques que chegarem nesse intervalo
+            self._evento.clear()
+            try:
+                self.processar()
+            except Exception:
+                # A thread não pode morrer: o que ficou sem marcar é tentado de novo com backoff
+                self._falhas_seguidas += 1
+                metricas.contar("fila.erros_trabalhador")
+
+    def processar(self):
+        # Aplica tudo o que não foi sincronizado (falhas antigas entram junto, para manter a ordem)
+        with self._lock_lote:
+            lote = self.nao_sincronizadas()
+            if not lote:
+                return
+            seqs = [op['seq'] for op in lote]
+            atividades, exclusoes = consolidar_operacoes(lote)
+            try:
+                with metricas.medir("fila.lote", operacoes=len(lote)):
+                    self.aplicar([{**dados} for dados in atividades.values()], sorted(exclusoes))
+            except Exception as e:
+                self._falhas_seguidas += 1
+                metricas.contar("fila.falhas")
+                self._marcar(seqs, FALHOU, erro=f"{type(e).__name__}: {e}")
+                return
+
+            self._falhas_seguidas = 0
+            metricas.contar("fila.lotes")
+            metricas.contar("fila.operacoes_consolidadas", len(lote) - len(atividades) - len(exclusoes))
+            # Recarrega antes de marcar: quem ler no meio ainda vê a alteração (pendente).
+            # A gravação já aconteceu: falha na recarga não desfaz o lote (a próxima
+            # verificação de revisão traz os dados)
+            if self.ao_sincronizar is not None:
+                try:
+                    self.ao_sincronizar()
+                except Exception:
+                    metricas.contar("fila.falhas_recarga")
+            self._marcar(seqs, SINCRONIZADO)
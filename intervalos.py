@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+# --- ÍNDICE DE INTERVALOS (Data Início, Data Fim) ---
+# Ordena pelo início e guarda o maior fim acumulado: a consulta por período vira duas
+# buscas binárias + um filtro só no trecho candidato, em vez de varrer a agenda toda.
+
+class IndiceIntervalos:
+    def __init__(self, inicios, fins, rotulos):
+        inicios = pd.to_datetime(inicios).to_numpy(dtype='datetime64[ns]')
+        fins = pd.to_datetime(fins).to_numpy(dtype='datetime64[ns]')
+        validos = ~(np.isnat(inicios) | np.isnat(fins))
+
+        posicoes = np.nonzero(validos)[0]
+        ordem = posicoes[np.argsort(inicios[posicoes], kind='stable')]
+        self.rotulos = np.asarray(rotulos)
+        self.posicoes = ordem
+        self.inicios = inicios[ordem]
+        self.fins = fins[ordem]
+        self.fim_max = np.maximum.accumulate(self.fins) if len(ordem) else self.fins
+
+    def __len__(self):
+        return len(self.posicoes)
+
+    def consultar(self, inicio, fim):
+        # Rótulos dos intervalos que se sobrepõem a [inicio, fim], na ordem original
+        inicio = np.datetime64(pd.Timestamp(inicio), 'ns')
+        fim = np.datetime64(pd.Timestamp(fim), 'ns')
+        ate = np.searchsorted(self.inicios, fim, side='right')
+        desde = np.searchsorted(self.fim_max, inicio, side='left')
+        if desde >= ate:
+            return self.rotulos[:0]
+        candidatos = np.nonzero(self.fins[desde:ate] >= inicio)[0] + desde
+        return self.rotulos[np.sort(self.posicoes[candidatos])]
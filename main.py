@@ -1,10 +1,31 @@
+import time
+import metricas  # Primeiro import do app: marca o início do processo para os tempos de partida
+
+inicio_execucao = time.perf_counter()
+
+import importlib
+import sys
 import streamlit as st
-import planejamento
-import plano_de_acao
+import conexao
 
 # Configuração da página (Sempre a primeira linha)
 st.set_page_config(page_title="Gestão de Obras", layout="wide")
 
+# --- PÁGINAS (IMPORTADAS SOB DEMANDA) ---
+# Cada rota importa só o seu módulo: abrir o editor não carrega plotly, e vice-versa.
+PAGINAS = {
+    'Planejamento': 'planejamento',
+    'Editar': 'plano_de_acao',
+    'Ocupacao': 'ocupacao',
+}
+
+def carregar_pagina(nome):
+    modulo = PAGINAS[nome]
+    if modulo in sys.modules:
+        return sys.modules[modulo]
+    with metricas.medir(f"importar.{modulo}"):
+        return importlib.import_module(modulo)
+
 # Inicializa estado da página
 if 'pagina_atual' not in st.session_state:
     st.session_state['pagina_atual'] = 'Planejamento'
@@ -16,23 +37,109 @@ if st.sidebar.button("📅 Cronograma (Gantt)", use_container_width=True):
     st.session_state['pagina_atual'] = 'Planejamento'
     st.rerun()
 
+if st.sidebar.button("🔥 Ocupação (Equipe/Frota)", use_container_width=True):
+    st.session_state['pagina_atual'] = 'Ocupacao'
+    st.rerun()
+
 if st.sidebar.button("📝 Editar Agenda (Tabela)", use_container_width=True):
     st.session_state['pagina_atual'] = 'Editar'
     st.rerun()
 
+# --- STATUS DAS GRAVAÇÕES (FILA EM SEGUNDO PLANO) ---
+def status_gravacoes():
+    estado = conexao.obter_fila().estado()
+    if estado['falhas']:
+        st.error(f"⚠️ {estado['falhas']} alteração(ões) não gravadas: {estado['ultimo_erro']}")
+        c1, c2 = st.columns(2)
+        if c1.button("Tentar de novo", use_container_width=True):
+            conexao.obter_fila().tentar_novamente()
+            st.rerun()
+        if c2.button("Descartar", use_container_width=True):
+            conexao.obter_fila().descartar_falhas()
+            st.rerun()
+    elif estado['pendentes']:
+        st.info(f"⏳ {estado['pendentes']} alteração(ões) aguardando gravação...")
+    elif estado['sincronizado_em']:
+        st.caption(f"✅ Tudo gravado ({time.strftime('%H:%M:%S', time.localtime(estado['sincronizado_em']))})")
+
+with st.sidebar:
+    # Enquanto houver pendências o quadro se atualiza sozinho, sem recarregar a página
+    pendentes = conexao.obter_fila().estado()['pendentes']
+    st.fragment(status_gravacoes, run_every=2 if pendentes else None)()
+
 st.sidebar.divider()
 
 # --- BOTÃO MÁGICO PARA LIMPAR O CACHE ---
-# Se você editou algo direto no Google Sheets e não apareceu, clique aqui.
+# Mudanças na planilha/Excel são detectadas sozinhas (revisão no Drive, a cada ~20 s).
+# O botão força recarregar tudo agora.
 st.sidebar.markdown("### Admin")
 if st.sidebar.button("🔄 Atualizar Dados (Limpar Cache)", use_container_width=True, type="secondary"):
-    st.cache_data.clear()  # Apaga a memória
+    conexao.invalidar()    # Apaga a memória de todos os conjuntos
+    if 'planejamento' in sys.modules:
+        sys.modules['planejamento'].FIGURAS.limpar()  # E os gráficos já montados
     st.rerun()             # Recarrega a página
 
+# Atualização seletiva: ex. só a Agenda, sem baixar de novo o Excel de Obras
+conjuntos_atualizar = st.sidebar.multiselect(
+    "Atualizar apenas",
+    options=list(conexao.CARREGADORES),
+    format_func=str.capitalize,
+    placeholder="Escolha os dados..."
+)
+if st.sidebar.button("Atualizar Selecionados", use_container_width=True, disabled=not conjuntos_atualizar):
+    conexao.invalidar(*conjuntos_atualizar)
+    st.rerun()
+
+# Mantém a Agenda viva pequena: o que terminou há muito tempo vai para a aba Arquivo
+if st.sidebar.button("🗄️ Arquivar Antigas", use_container_width=True,
+                     help=f"Move para o Arquivo as atividades que terminaram há mais de {conexao.DIAS_ARQUIVAMENTO} dias"):
+    try:
+        movidas = conexao.arquivar_antigas(conexao.get_hoje())
+        st.toast(f"{movidas} atividade(s) arquivada(s)." if movidas else "Nada para arquivar.")
+        st.rerun()
+    except Exception as e:
+        st.sidebar.error(f"Erro ao arquivar: {e}")
+
+# Preenchido depois da página, para já mostrar os tempos desta execução
+painel_desempenho = st.sidebar.expander("⏱️ Desempenho")
+
 st.sidebar.divider()
 
 # --- ROTEAMENTO DE PÁGINAS ---
-if st.session_state['pagina_atual'] == 'Planejamento':
-    planejamento.app()
-elif st.session_state['pagina_atual'] == 'Editar':
-    plano_de_acao.app()
+pagina_atual = st.session_state['pagina_atual']
+carregar_pagina(pagina_atual).app()
+
+# Tempo até a página ficar pronta: toda execução, a primeira da sessão em cada página
+# e a primeira do processo (partida a frio, desde o primeiro import)
+duracao_pagina = time.perf_counter() - inicio_execucao
+metricas.registrar(f"pagina.{pagina_atual}", duracao_pagina)
+paginas_vistas = st.session_state.setdefault('paginas_vistas', set())
+if pagina_atual not in paginas_vistas:
+    paginas_vistas.add(pagina_atual)
+    metricas.registrar(f"pagina.{pagina_atual}.primeira_da_sessao", duracao_pagina)
+metricas.marco_unico(f"partida.{pagina_atual}")
+
+# --- PAINEL DE DESEMPENHO (ADMIN) ---
+with painel_desempenho:
+    st.caption("Tempos por etapa (desde o início do processo)")
+    st.dataframe(metricas.resumo(), hide_index=True, use_container_width=True)
+
+    caches = metricas.resumo_cache()
+    if 'planejamento' in sys.modules:
+        planejamento = sys.modules['planejamento']
+        info_calendario = planejamento.camadas_calendario.cache_info()
+        caches.append({'cache': 'calendario', 'hits': info_calendario.hits, 'misses': info_calendario.misses})
+        info_figuras = planejamento.FIGURAS.info()
+        caches.append({'cache': f"figuras ({info_figuras['tamanho']}/{info_figuras['capacidade']})",
+                       'hits': info_figuras['hits'], 'misses': info_figuras['misses']})
+    st.caption("Cache (hits / misses)")
+    st.dataframe(caches, hide_index=True, use_container_width=True)
+
+    st.caption("Google API (por endpoint)")
+    st.dataframe(metricas.resumo_endpoints(), hide_index=True, use_container_width=True)
+
+    st.download_button("Exportar JSON lines", metricas.exportar_jsonl(), file_name="metricas.jsonl",
+                       mime="application/x-ndjson", use_container_width=True)
+    if st.button("Zerar métricas", use_container_width=True):
+        metricas.limpar()
+        st.rerun()
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import wraps
+
+# --- INSTRUMENTAÇÃO (TEMPOS E CONTADORES) ---
+# Registro único por processo (compartilhado entre as sessões do Streamlit).
+# Os spans recentes ficam num buffer circular e podem ser exportados como JSON lines.
+
+MAX_SPANS = 5000
+
+_lock = threading.Lock()
+_spans = deque(maxlen=MAX_SPANS)
+_estatisticas = {}  # nome -> [chamadas, total_s, max_s, erros]
+_contadores = Counter()
+
+
+def registrar(nome, duracao, erro=None, **atributos):
+    registro = {'ts': time.time(), 'nome': nome, 'ms': round(duracao * 1000, 3)}
+    if erro:
+        registro['erro'] = erro
+    if atributos:
+        registro.update(atributos)
+    with _lock:
+        _spans.append(registro)
+        est = _estatisticas.setdefault(nome, [0, 0.0, 0.0, 0])
+        est[0] += 1
+        est[1] += duracao
+        est[2] = max(est[2], duracao)
+        if erro:
+            est[3] += 1
+
+@contextmanager
+def medir(nome, **atributos):
+    erro = None
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        erro = type(e).__name__
+        raise
+    finally:
+        registrar(nome, time.perf_counter() - t0, erro=erro, **atributos)
+
+def cronometrado(nome):
+    def decorador(funcao):
+        @wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir(nome):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+# Marcos de partida: tempo desde a importação deste módulo (o primeiro import do app)
+_inicio_processo = time.perf_counter()
+_marcos = set()
+
+def marco_unico(nome):
+    # Registra só na primeira vez no processo (ex.: primeira página pronta após a partida)
+    with _lock:
+        if nome in _marcos:
+            return
+        _marcos.add(nome)
+    registrar(nome, time.perf_counter() - _inicio_processo)
+
+def contar(nome, quantidade=1):
+    with _lock:
+        _contadores[nome] += quantidade
+
+# Funções com st.cache_*: o acesso é contado por quem chama e o miss dentro da função
+# (o corpo só roda quando não há cache). hits = chamadas - misses.
+def acesso_cache(nome):
+    contar(f"cache.{nome}.chamadas")
+
+def miss_cache(nome):
+    contar(f"cache.{nome}.miss")
+
+
+# --- CONSULTA / EXPORTAÇÃO ---
+
+def resumo():
+    with _lock:
+        itens = [(nome, list(est)) for nome, est in _estatisticas.items()]
+    return [
+        {'etapa': nome, 'chamadas': chamadas, 'media_ms': round(total / chamadas * 1000, 1),
+         'max_ms': round(maximo * 1000, 1), 'total_ms': round(total * 1000, 1), 'erros': erros}
+        for nome, (chamadas, total, maximo, erros) in sorted(itens)
+    ]
+
+def resumo_cache():
+    with _lock:
+        contadores = dict(_contadores)
+    nomes = sorted({chave.split(".")[1] for chave in contadores if chave.startswith("cache.")})
+    linhas = []
+    for nome in nomes:
+        chamadas = contadores.get(f"cache.{nome}.chamadas", 0)
+        misses = contadores.get(f"cache.{nome}.miss", 0)
+        linhas.append({'cache': nome, 'hits': max(chamadas - misses, 0), 'misses': misses})
+    return linhas
+
+def resumo_endpoints(prefixo="google."):
+    # Uma linha por endpoint de API: latência (inclui tentativas com erro), retentativas e 429
+    contagem = contadores()
+    linhas = []
+    for etapa in resumo():
+        nome = etapa['etapa']
+        if not nome.startswith(prefixo) or nome.endswith(".fila_orcamento"):
+            continue
+        linhas.append({
+            'endpoint': nome[len(prefixo):],
+            'chamadas': etapa['chamadas'],
+            'media_ms': etapa['media_ms'],
+            'max_ms': etapa['max_ms'],
+            'retentativas': contagem.get(f"{nome}.retentativas", 0),
+            'limitadas_429': contagem.get(f"{nome}.limitadas", 0),
+            'erros': etapa['erros'],
+        })
+    return linhas
+
+def contadores():
+    with _lock:
+        return dict(_contadores)
+
+def exportar_jsonl():
+    with _lock:
+        spans = list(_spans)
+    return "\n".join(json.dumps(span, ensure_ascii=False, default=str) for span in spans) + ("\n" if spans else "")
+
+def limpar():
+    with _lock:
+        _spans.clear()
+        _estatisticas.clear()
+        _contadores.clear()
@@ -0,0 +1,152 @@
+import streamlit as st
+import plotly.graph_objects as go
+import pandas as pd
+import numpy as np
+import atribuicoes as atribuicoes_mod
+import conexao
+import metricas
+import planejamento
+
+# --- OCUPAÇÃO DIÁRIA (EQUIPE / FROTA) ---
+# Matriz recurso × dia montada sem laço por dia: cada atribuição soma +1 no dia em que
+# começa e -1 no dia seguinte ao fim (np.add.at); a soma acumulada ao longo dos dias dá
+# quantas atividades ocupam o recurso em cada dia do período.
+
+TIPOS = {atribuicoes_mod.PESSOA: "Equipe", atribuicoes_mod.VEICULO: "Frota"}
+
+# 0 livre, 1 ocupado, 2 e 3+ sobrecarregado (mesmas cores das situações do cronograma)
+ESCALA_OCUPACAO = [
+    [0.0, "#1F2937"], [1 / 6, "#1F2937"],
+    [1 / 6, "#10B981"], [0.5, "#10B981"],
+    [0.5, "#F59E0B"], [5 / 6, "#F59E0B"],
+    [5 / 6, "#EF4444"], [1.0, "#EF4444"],
+]
+
+@metricas.cronometrado("ocupacao.matriz")
+def matrizes_ocupacao(tabela, df_agenda, inicio, fim):
+    # tabela: TabelaAtribuicoes de df_agenda. Retorna {tipo: matriz (recursos × dias)}
+    n_dias = (fim - inicio).days + 1
+    base = np.datetime64(inicio, 'D')
+    pares = tabela.tabela()
+
+    posicoes = df_agenda.index.get_indexer(pares['linha'].to_numpy())
+    validos = posicoes >= 0
+    inicios = df_agenda['Data Início'].to_numpy(dtype='datetime64[D]')[posicoes[validos]]
+    fins = df_agenda['Data Fim'].to_numpy(dtype='datetime64[D]')[posicoes[validos]]
+    tipos = pares['tipo'].to_numpy()[validos]
+    recursos = pares['recurso'].to_numpy()[validos]
+
+    # Recorta cada intervalo ao período; datas vazias e intervalos fora dele saem
+    datas_ok = ~(np.isnat(inicios) | np.isnat(fins))
+    desde = np.clip((inicios[datas_ok] - base).astype(np.int64), 0, None)
+    ate = np.clip((fins[datas_ok] - base).astype(np.int64), None, n_dias - 1)
+    tipos, recursos = tipos[datas_ok], recursos[datas_ok]
+    no_periodo = desde <= ate
+
+    matrizes = {}
+    for tipo in TIPOS:
+        sel = no_periodo & (tipos == tipo)
+        variacao = np.zeros((len(tabela.nomes[tipo]), n_dias + 1), dtype=np.int32)
+        np.add.at(variacao, (recursos[sel], desde[sel]), 1)
+        np.add.at(variacao, (recursos[sel], ate[sel] + 1), -1)
+        matrizes[tipo] = np.cumsum(variacao, axis=1)[:, :n_dias]
+    return matrizes
+
+def somar_matrizes(a, b):
+    # Mesmo tipo pode ter mais recursos em b (nomes que só aparecem no arquivo): completa com zeros
+    soma = {}
+    for tipo in a:
+        linhas = max(len(a[tipo]), len(b[tipo]))
+        soma[tipo] = np.zeros((linhas, a[tipo].shape[1]), dtype=np.int32)
+        soma[tipo][:len(a[tipo])] += a[tipo]
+        soma[tipo][:len(b[tipo])] += b[tipo]
+    return soma
+
+def montar_heatmap(matrizes, nomes, tipos, inicio, fim):
+    # Uma linha por recurso (equipe primeiro, depois frota), uma coluna por dia
+    dias = pd.date_range(inicio, fim, freq='D')
+    z = np.vstack([matrizes[tipo] for tipo in tipos])
+    rotulos = [f"{nome} ({TIPOS[tipo]})" if tipo == atribuicoes_mod.VEICULO else nome
+               for tipo in tipos for nome in nomes[tipo][:len(matrizes[tipo])]]
+
+    fig = go.Figure(go.Heatmap(
+        z=z, x=dias, y=rotulos,
+        zmin=0, zmax=3, colorscale=ESCALA_OCUPACAO,
+        xgap=1, ygap=1,
+        colorbar=dict(title="Atividades", tickvals=[0, 1, 2, 3], ticktext=["0", "1", "2", "3+"]),
+        hovertemplate="<b>%{y}</b><br>%{x|%d/%m/%Y}: %{z} atividade(s)<extra></extra>",
+    ))
+    fig.update_layout(
+        height=max(300, 22 * len(rotulos) + 120),
+        margin=dict(l=10, r=10, t=30, b=10),
+        yaxis=dict(autorange="reversed", tickfont=dict(size=12)),
+        xaxis=dict(side="top", tickformat="%d/%m", dtick=86400000.0 * (7 if len(dias) > 45 else 1)),
+    )
+    return fig
+
+def resumo_sobrecarga(matrizes, nomes, tipos):
+    # Recursos com mais de uma atividade no mesmo dia, do mais sobrecarregado para o menos
+    linhas = []
+    for tipo in tipos:
+        matriz = matrizes[tipo]
+        dias_sobrecarga = (matriz > 1).sum(axis=1)
+        for i in np.flatnonzero(dias_sobrecarga):
+            linhas.append({'Recurso': nomes[tipo][i], 'Tipo': TIPOS[tipo],
+                           'Dias com sobrecarga': int(dias_sobrecarga[i]), 'Máximo no dia': int(matriz[i].max())})
+    return pd.DataFrame(linhas, columns=['Recurso', 'Tipo', 'Dias com sobrecarga', 'Máximo no dia']) \
+        .sort_values('Dias com sobrecarga', ascending=False)
+
+# --- APP PRINCIPAL ---
+def app():
+    planejamento.aplicar_estilo()
+    st.header("Ocupação da Equipe e da Frota")
+
+    df_agenda, df_frota, df_time, _, _ = conexao.carregar_dados()
+    if df_agenda.empty:
+        st.info("Nenhum agendamento.")
+        return
+
+    hoje = conexao.get_hoje()
+    planejamento.iniciar_periodo(hoje)
+
+    c_botoes, c_tipos = st.columns([2, 1])
+    with c_botoes:
+        planejamento.botoes_periodo(hoje)
+    with c_tipos:
+        tipos = st.multiselect("Recursos", list(TIPOS), default=list(TIPOS), format_func=TIPOS.get,
+                               label_visibility="collapsed", placeholder="Recursos")
+
+    zoom_ini, zoom_fim = st.session_state['zoom_ini'], st.session_state['zoom_fim']
+    if not tipos or zoom_fim < zoom_ini:
+        st.info("Escolha os recursos e um período válido.")
+        return
+
+    tabela = conexao.carregar_atribuicoes(df_agenda, df_time, df_frota)
+    matrizes = matrizes_ocupacao(tabela, df_agenda, zoom_ini, zoom_fim)
+    nomes = tabela.nomes
+
+    # Períodos antigos: soma as atividades arquivadas (mesmos códigos de recurso)
+    try:
+        df_arquivadas = planejamento.janela_arquivo(zoom_ini, zoom_fim, hoje)
+    except Exception as e:
+        st.warning(f"Não foi possível ler o arquivo de atividades antigas: {e}")
+        df_arquivadas = None
+    if df_arquivadas is not None and not df_arquivadas.empty:
+        tabela_arquivo = tabela.para(df_arquivadas)
+        matrizes = somar_matrizes(matrizes, matrizes_ocupacao(tabela_arquivo, df_arquivadas, zoom_ini, zoom_fim))
+        nomes = tabela_arquivo.nomes
+
+    if not sum(len(matrizes[tipo]) for tipo in tipos):
+        st.info("Nenhum executante ou veículo cadastrado.")
+        return
+
+    fig = montar_heatmap(matrizes, nomes, tipos, zoom_ini, zoom_fim)
+    with metricas.medir("ocupacao.grafico_envio"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    df_sobrecarga = resumo_sobrecarga(matrizes, nomes, tipos)
+    if df_sobrecarga.empty:
+        st.caption("Nenhum recurso com mais de uma atividade no mesmo dia no período.")
+    else:
+        with st.expander(f"⚠️ Recursos sobrecarregados ({len(df_sobrecarga)})"):
+            st.dataframe(df_sobrecarga, hide_index=True, use_container_width=True)
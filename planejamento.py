@@ -1,10 +1,17 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+import numpy as np
 import conexao
-from datetime import datetime, timedelta
+import atribuicoes as atribuicoes_mod
+import conflitos as conflitos_mod
+import metricas
+from intervalos import IndiceIntervalos
+from datetime import timedelta
 import calendar
-import pytz 
+from functools import lru_cache
+from collections import OrderedDict
+import threading
 
 # --- CONFIGURAÇÃO DE ESTILO (CSS REFINADO) ---
 def aplicar_estilo():
@@ -62,49 +69,105 @@ def aplicar_estilo():
         </style>
     """, unsafe_allow_html=True)
 
-# --- CONFIGURAÇÃO DE FUSO E DATAS ---
-FUSO_BR = pytz.timezone('America/Sao_Paulo')
-
-def get_hoje():
-    return datetime.now(FUSO_BR).date()
-
+# --- DATAS ---
+# Fuso e "hoje" ficam em conexao: a barra lateral (Arquivar) usa sem importar esta página
 def get_proxima_semana():
-    hoje = get_hoje()
+    hoje = conexao.get_hoje()
     dias_para_segunda = 7 - hoje.weekday()
     proxima_segunda = hoje + timedelta(days=dias_para_segunda)
     proxima_sexta = proxima_segunda + timedelta(days=4)
     return proxima_segunda, proxima_sexta
 
-def calcular_situacao_e_cores(row):
-    hoje = get_hoje()
-    try:
-        inicio = pd.to_datetime(row['Data Início'], dayfirst=True).date()
-        fim = pd.to_datetime(row['Data Fim'], dayfirst=True).date()
-    except:
-        return pd.Series(["Erro", "#000", "#000"])
-    
-    if inicio > hoje:
-        situacao = "Não Iniciada"
-        cor_fill = "#EF4444"
-        cor_line = "#7F1D1D"
-    elif fim < hoje:
-        situacao = "Concluída"
-        cor_fill = "#10B981"
-        cor_line = "#064E3B"
-    else:
-        situacao = "Em Andamento"
-        cor_fill = "#F59E0B"
-        cor_line = "#78350F"
-        
-    return pd.Series([situacao, cor_fill, cor_line])
+# --- CLASSIFICAÇÃO DE SITUAÇÃO (VETORIZADA) ---
+SITUACOES = ["Não Iniciada", "Em Andamento", "Concluída"]
+CORES_SITUACAO = {
+    "Não Iniciada": ("#EF4444", "#7F1D1D"),
+    "Em Andamento": ("#F59E0B", "#78350F"),
+    "Concluída": ("#10B981", "#064E3B"),
+    "Erro": ("#000", "#000"),
+}
+
+def classificar_situacao(inicio, fim, hoje):
+    # inicio/fim: Series datetime64; hoje: date. Datas inválidas (NaT) viram "Erro".
+    hoje = np.datetime64(pd.Timestamp(hoje).normalize(), 'ns')
+    ini = inicio.dt.normalize().to_numpy(dtype='datetime64[ns]')
+    fim = fim.dt.normalize().to_numpy(dtype='datetime64[ns]')
+
+    situacao = np.select(
+        [np.isnat(ini) | np.isnat(fim), ini > hoje, fim < hoje],
+        ["Erro", "Não Iniciada", "Concluída"],
+        default="Em Andamento"
+    )
+
+    categorias = list(CORES_SITUACAO)
+    codigos = pd.Categorical(situacao, categories=categorias).codes
+    return pd.DataFrame({
+        'Situacao': pd.Categorical.from_codes(codigos, categories=categorias),
+        'CorFill': pd.Categorical.from_codes(codigos, categories=[CORES_SITUACAO[c][0] for c in categorias]),
+        'CorLine': pd.Categorical.from_codes(codigos, categories=[CORES_SITUACAO[c][1] for c in categorias]),
+    }, index=inicio.index)
+
+# --- FUNDO DO CALENDÁRIO (FINS DE SEMANA / MESES / HOJE) ---
+# Margem desenhada além do zoom atual, para o "pan" não cair em área sem fundo
+MARGEM_CALENDARIO = timedelta(days=120)
+
+@lru_cache(maxsize=32)
+def camadas_calendario(zoom_ini, zoom_fim, hoje):
+    # Retorna (shapes, annotations) do layout. Sábado+domingo viram um único retângulo.
+    inicio = zoom_ini - MARGEM_CALENDARIO
+    fim = zoom_fim + MARGEM_CALENDARIO
+
+    shapes = [dict(type="rect", xref="x", yref="paper", x0=hoje.isoformat(), x1=(hoje + timedelta(days=1)).isoformat(),
+                   y0=0, y1=1, fillcolor="#00FFFF", opacity=0.15, layer="below", line_width=0)]
+    anotacoes = [dict(x=hoje.isoformat(), y=0, yref="paper", yanchor="bottom", text="HOJE", showarrow=False,
+                      font=dict(color="#00FFFF", weight="bold"), yshift=0, xshift=20)]
+
+    # Primeiro sábado da janela (ou o domingo, se a janela começa num domingo)
+    dia = inicio - timedelta(days=1) if inicio.weekday() == 6 else inicio + timedelta(days=(5 - inicio.weekday()) % 7)
+    while dia <= fim:
+        shapes.append(dict(type="rect", xref="x", yref="paper", x0=max(dia, inicio).isoformat(),
+                           x1=(dia + timedelta(days=2)).isoformat(), y0=0, y1=1,
+                           fillcolor="white", opacity=0.08, layer="below", line_width=0))
+        dia += timedelta(days=7)
+
+    mes = inicio.replace(day=1)
+    if mes < inicio:
+        mes = (mes + timedelta(days=32)).replace(day=1)
+    while mes <= fim:
+        shapes.append(dict(type="line", xref="x", yref="paper", x0=mes.isoformat(), x1=mes.isoformat(), y0=0, y1=1,
+                           line=dict(width=3, color="#FFFFFF"), opacity=0.8))
+        anotacoes.append(dict(x=mes.isoformat(), y=0, yref="paper", text=mes.strftime('%b').upper(), showarrow=False,
+                              font=dict(color="#FFFFFF", size=14, weight="bold"), yshift=-30))
+        mes = (mes + timedelta(days=32)).replace(day=1)
+
+    return tuple(shapes), tuple(anotacoes)
+
+# --- AVISO DE CONFLITOS NOS MODAIS ---
+def _fmt_data(valor):
+    return valor.strftime('%d/%m/%Y') if hasattr(valor, 'strftime') else str(valor)
+
+def avisar_conflitos(recursos, df_ref, pessoas, veiculos, inicio, fim, ignorar=None):
+    conflitos = [(atribuicoes_mod.PESSOA, r, rot) for r, rot in recursos.verificar(atribuicoes_mod.PESSOA, pessoas, inicio, fim, ignorar)]
+    conflitos += [(atribuicoes_mod.VEICULO, r, rot) for r, rot in recursos.verificar(atribuicoes_mod.VEICULO, veiculos, inicio, fim, ignorar)]
+    if not conflitos:
+        return
+    linhas = []
+    for tipo, recurso, rotulo in conflitos[:10]:
+        if rotulo in df_ref.index:
+            ativ = df_ref.loc[rotulo]
+            linhas.append(f"- **{recurso}** ({conflitos_mod.ROTULOS_TIPO[tipo].lower()}) já está em {ativ['Projeto']} "
+                          f"({_fmt_data(ativ['Data Início'])} a {_fmt_data(ativ['Data Fim'])})")
+    if len(conflitos) > 10:
+        linhas.append(f"- ... e mais {len(conflitos) - 10} conflito(s)")
+    st.warning("Conflito de agenda:\n" + "\n".join(linhas), icon="⚠️")
 
 # --- DIALOGS ---
 
 @st.dialog("Selecionar Período")
 def modal_datas_personalizadas():
     st.write("Defina o período:")
-    padrao_ini = st.session_state.get('zoom_ini', get_hoje())
-    padrao_fim = st.session_state.get('zoom_fim', get_hoje() + timedelta(days=30))
+    padrao_ini = st.session_state.get('zoom_ini', conexao.get_hoje())
+    padrao_fim = st.session_state.get('zoom_fim', conexao.get_hoje() + timedelta(days=30))
     c1, c2 = st.columns(2)
     with c1: ini = st.date_input("De", value=padrao_ini, format="DD/MM/YYYY")
     with c2: fim = st.date_input("Até", value=padrao_fim, format="DD/MM/YYYY")
@@ -114,9 +177,36 @@ def modal_datas_personalizadas():
         st.session_state['view_mode'] = 'custom'
         st.rerun()
 
+# --- CONTROLES DE PERÍODO (ZOOM) ---
+# Compartilhados pelas páginas (Cronograma, Ocupação): o período fica no session_state
+def iniciar_periodo(hoje):
+    if 'view_mode' not in st.session_state: st.session_state['view_mode'] = '30d'
+    if 'zoom_ini' not in st.session_state: st.session_state['zoom_ini'] = hoje
+    if 'zoom_fim' not in st.session_state: st.session_state['zoom_fim'] = hoje + timedelta(days=30)
+
+def periodos_predefinidos(hoje):
+    # view_mode -> (rótulo, início, fim); usados pelos botões e pelo modo "no navegador" do Gantt
+    _, last = calendar.monthrange(hoje.year, hoje.month)
+    return {
+        '30d': ("30 Dias", hoje, hoje + timedelta(days=30)),
+        'mes': ("Mês Atual", hoje.replace(day=1), hoje.replace(day=last)),
+        '3m': ("3 Meses", hoje, hoje + timedelta(days=90)),
+    }
+
+def botoes_periodo(hoje):
+    colunas = st.columns(4)
+    for coluna, (modo, (rotulo, ini, fim)) in zip(colunas, periodos_predefinidos(hoje).items()):
+        if coluna.button(rotulo, use_container_width=True, type="primary" if st.session_state['view_mode']==modo else "secondary"):
+            st.session_state['zoom_ini'] = ini
+            st.session_state['zoom_fim'] = fim
+            st.session_state['view_mode'] = modo
+            st.rerun()
+    if colunas[3].button("Personalizado", use_container_width=True, type="primary" if st.session_state['view_mode']=='custom' else "secondary"):
+        modal_datas_personalizadas()
+
 # --- MODAL DE EDIÇÃO ---
 @st.dialog("Editar Atividade")
-def modal_editar_atividade(index_original, df_full, lista_time):
+def modal_editar_atividade(index_original, df_full, lista_time, recursos=None, atribuicoes=None):
     st.subheader("Alterar Dados")
     try:
         dados_atuais = df_full.loc[index_original]
@@ -127,64 +217,68 @@ def modal_editar_atividade(index_original, df_full, lista_time):
     st.caption(f"Projeto: {dados_atuais['Projeto']} | Cliente: {dados_atuais['Cliente']}")
     st.text_input("Descrição", value=dados_atuais['Descrição'], disabled=True)
 
-    try:
-        dt_ini_atual = pd.to_datetime(dados_atuais['Data Início'], dayfirst=True).date()
-        dt_fim_atual = pd.to_datetime(dados_atuais['Data Fim'], dayfirst=True).date()
-    except:
-        dt_ini_atual = get_hoje()
-        dt_fim_atual = get_hoje()
+    # Datas já chegam como datetime64 (NaT quando a célula estava vazia/inválida)
+    dt_ini_atual = dados_atuais['Data Início'].date() if pd.notna(dados_atuais['Data Início']) else conexao.get_hoje()
+    dt_fim_atual = dados_atuais['Data Fim'].date() if pd.notna(dados_atuais['Data Fim']) else conexao.get_hoje()
 
     c1, c2 = st.columns(2)
     with c1: nova_data_ini = st.date_input("Início", value=dt_ini_atual, format="DD/MM/YYYY")
     with c2: nova_data_fim = st.date_input("Fim", value=dt_fim_atual, format="DD/MM/YYYY")
 
+    # Equipe atual vem da tabela de atribuições (sem reprocessar o texto da coluna)
     equipe_atual = []
-    if isinstance(dados_atuais['Executantes'], str):
+    if atribuicoes is not None:
+        equipe_atual = atribuicoes.recursos_da_linha(index_original, atribuicoes_mod.PESSOA)
+    elif isinstance(dados_atuais['Executantes'], str):
         equipe_atual = [x.strip() for x in dados_atuais['Executantes'].split(',')]
     equipe_validada = [x for x in equipe_atual if x in lista_time]
     
     novos_executantes = st.multiselect("Executantes", options=lista_time, default=equipe_validada)
 
+    if recursos is not None and nova_data_ini and nova_data_fim:
+        veiculo_atual = [str(dados_atuais.get('Veículo', '') or '').strip()]
+        avisar_conflitos(recursos, df_full, novos_executantes, [v for v in veiculo_atual if v],
+                         nova_data_ini, nova_data_fim, ignorar=index_original)
+
     if st.button("Salvar Alterações", type="primary"):
         if nova_data_fim < nova_data_ini:
             st.error("A data de término não pode ser antes do início.")
             return
 
-        with st.spinner("Salvando..."):
-            df_full.at[index_original, 'Data Início'] = nova_data_ini.strftime('%d/%m/%Y')
-            df_full.at[index_original, 'Data Fim'] = nova_data_fim.strftime('%d/%m/%Y')
-            df_full.at[index_original, 'Executantes'] = ", ".join(novos_executantes)
-            
-            df_full['Data Início'] = pd.to_datetime(df_full['Data Início'], dayfirst=True).dt.strftime('%d/%m/%Y')
-            df_full['Data Fim'] = pd.to_datetime(df_full['Data Fim'], dayfirst=True).dt.strftime('%d/%m/%Y')
-            df_full = df_full.fillna("")
-            
-            try:
-                conexao.salvar_no_sheets(df_full)
-                st.cache_data.clear()
-                st.success("Salvo!")
-                st.rerun()
-            except Exception as e:
-                st.error(f"Erro: {e}")
+        df_novo = df_full.copy()
+        df_novo.at[index_original, 'Data Início'] = pd.Timestamp(nova_data_ini)
+        df_novo.at[index_original, 'Data Fim'] = pd.Timestamp(nova_data_fim)
+        df_novo.at[index_original, 'Executantes'] = ", ".join(novos_executantes)
+
+        try:
+            # Vai para a fila de gravação: a tela já mostra a alteração
+            conexao.enfileirar_gravacao(df_novo, df_full)
+            st.rerun()
+        except Exception as e:
+            st.error(f"Erro: {e}")
+
+LIMITE_BUSCA_PROJETOS = 200
 
 @st.dialog("Novo Agendamento")
-def modal_agendamento(df_obras, df_frota, df_time, df_agenda_atual):
+def modal_agendamento(catalogo, df_frota, df_time, df_agenda_atual, recursos=None):
     st.write("Preencha os dados abaixo:")
-    lista_projetos = df_obras['Projeto'].astype(str).dropna().unique().tolist() if 'Projeto' in df_obras.columns else []
-    lista_time = df_time['Nome'].dropna().unique().tolist() if not df_time.empty and 'Nome' in df_time.columns else []
-    col_veic = 'Veículo' if 'Veículo' in df_frota.columns else 'Placa'
-    lista_veiculos = df_frota[col_veic].dropna().unique().tolist() if not df_frota.empty else []
+    lista_time = conexao.lista_pessoas(df_time)
+    lista_veiculos = conexao.lista_veiculos(df_frota)
 
-    projeto_selecionado = st.selectbox("Projeto", options=lista_projetos, index=None, placeholder="Selecione...")
+    # Com dezenas de milhares de obras a lista vem filtrada pelo catálogo (código, descrição, cliente, cidade)
+    termo = st.text_input("Buscar projeto", placeholder="Código, descrição, cliente ou cidade...")
+    opcoes_projeto = catalogo.buscar(termo, limite=LIMITE_BUSCA_PROJETOS)
+    projeto_selecionado = st.selectbox("Projeto", options=opcoes_projeto, index=None, placeholder="Selecione...",
+                                       format_func=catalogo.rotulo)
+    if termo and not opcoes_projeto:
+        st.caption("Nenhum projeto encontrado.")
 
     desc_auto = ""
     cliente_auto = ""
-    if projeto_selecionado:
-        df_obras['Projeto'] = df_obras['Projeto'].astype(str)
-        dados = df_obras[df_obras['Projeto'] == str(projeto_selecionado)].iloc[0]
-        if 'Descricao' in dados: desc_auto = dados['Descricao']
-        elif 'Descrição' in dados: desc_auto = dados['Descrição']
-        cliente_auto = f"{dados.get('Cliente', '')} - {dados.get('Cidade', '')}"
+    dados = catalogo.dados(projeto_selecionado) if projeto_selecionado else None
+    if dados:
+        desc_auto = dados['Descrição']
+        cliente_auto = f"{dados['Cliente']} - {dados['Cidade']}"
 
     descricao = st.text_input("Descrição", value=desc_auto, disabled=True) 
     cliente = st.text_input("Cliente", value=cliente_auto, disabled=True) 
@@ -197,6 +291,9 @@ def modal_agendamento(df_obras, df_frota, df_time, df_agenda_atual):
     executantes = st.multiselect("Executantes", options=lista_time)
     veiculo = st.selectbox("Veículo (Opcional)", options=lista_veiculos, index=None, placeholder="Selecione...")
 
+    if recursos is not None and data_inicio and data_fim:
+        avisar_conflitos(recursos, df_agenda_atual, executantes, [veiculo] if veiculo else [], data_inicio, data_fim)
+
     if st.button("Salvar Agendamento", type="primary"):
         erros = []
         if not projeto_selecionado: erros.append("Selecione um Projeto")
@@ -211,28 +308,398 @@ def modal_agendamento(df_obras, df_frota, df_time, df_agenda_atual):
             st.error(f"Atenção: {', '.join(erros)}")
             return
         
-        with st.spinner("Registrando..."):
-            nova_linha = pd.DataFrame([{
-                "Projeto": str(projeto_selecionado),
-                "Descrição": descricao,
-                "Cliente": cliente,
-                "Data Início": data_inicio.strftime('%d/%m/%Y'),
-                "Data Fim": data_fim.strftime('%d/%m/%Y'),
-                "Executantes": ", ".join(executantes),
-                "Veículo": veiculo if veiculo else "",
-                "Status": "Planejado" 
-            }])
-            if df_agenda_atual.empty: df_final = nova_linha
-            else: df_final = pd.concat([df_agenda_atual, nova_linha], ignore_index=True)
-            try:
-                df_final['Data Início'] = pd.to_datetime(df_final['Data Início'], dayfirst=True).dt.strftime('%d/%m/%Y')
-                df_final['Data Fim'] = pd.to_datetime(df_final['Data Fim'], dayfirst=True).dt.strftime('%d/%m/%Y')
-                df_final = df_final.fillna("")
-                conexao.salvar_no_sheets(df_final)
-                st.cache_data.clear()
-                st.success("Agendamento realizado com sucesso!")
-                st.rerun()
-            except Exception as e: st.error(f"Houve um problema ao salvar: {e}")
+        nova_linha = pd.DataFrame([{
+            "Projeto": str(projeto_selecionado),
+            "Descrição": descricao,
+            "Cliente": cliente,
+            "Data Início": pd.Timestamp(data_inicio),
+            "Data Fim": pd.Timestamp(data_fim),
+            "Executantes": ", ".join(executantes),
+            "Veículo": veiculo if veiculo else "",
+            "Status": "Planejado" 
+        }])
+        if df_agenda_atual.empty: df_final = nova_linha
+        else: df_final = pd.concat([df_agenda_atual, nova_linha], ignore_index=True)
+        try:
+            conexao.enfileirar_gravacao(df_final, df_agenda_atual)
+            st.rerun()
+        except Exception as e: st.error(f"Houve um problema ao salvar: {e}")
+
+# --- TABELA PAGINADA ---
+COLUNAS_TABELA = {
+    'Projeto': 'Projeto',
+    'Descrição': 'Descrição',
+    'Cliente': 'Cliente',
+    'Inicio_Fmt': 'Início',
+    'Fim_Fmt': 'Fim',
+    'Executantes': 'Equipe',
+    'Situacao': 'Situação',
+}
+ORDENACOES_TABELA = {
+    "Padrão (situação e início)": None,
+    "Projeto": 'Projeto',
+    "Cliente": 'Cliente',
+    "Início": 'Data Início',
+    "Fim": 'Data Fim',
+}
+COLUNAS_BUSCA = ['Projeto', 'Descrição', 'Cliente', 'Executantes']
+
+def filtrar_tabela(df, busca, ordenacao, decrescente):
+    # Busca e ordenação feitas no servidor, antes de paginar
+    if busca:
+        texto = df[COLUNAS_BUSCA[0]].astype(str)
+        for col in COLUNAS_BUSCA[1:]:
+            texto = texto + " " + df[col].astype(str)
+        df = df[texto.str.contains(busca, case=False, regex=False)]
+    coluna = ORDENACOES_TABELA[ordenacao]
+    if coluna:
+        df = df.sort_values(by=coluna, ascending=not decrescente, kind='stable')
+    elif decrescente:
+        df = df.iloc[::-1]
+    return df
+
+def tabela_atividades(df_filtrado, df_agenda, lista_time, recursos=None, atribuicoes=None):
+    c_busca, c_ordem, c_dir, c_tam = st.columns([3, 2, 1, 1], vertical_alignment="bottom")
+    busca = c_busca.text_input("Buscar", placeholder="Projeto, descrição, cliente ou equipe...", key="tabela_busca")
+    ordenacao = c_ordem.selectbox("Ordenar por", list(ORDENACOES_TABELA), key="tabela_ordem")
+    decrescente = c_dir.toggle("Decrescente", key="tabela_desc")
+    tamanho = c_tam.selectbox("Por página", [25, 50, 100], key="tabela_tamanho")
+
+    df_tabela = filtrar_tabela(df_filtrado, busca.strip(), ordenacao, decrescente)
+    total = len(df_tabela)
+    if total == 0:
+        st.info("Nenhuma atividade encontrada para a busca.")
+        return
+
+    total_paginas = (total + tamanho - 1) // tamanho
+    if st.session_state.get('tabela_pagina', 1) > total_paginas:
+        st.session_state['tabela_pagina'] = total_paginas  # Busca/filtro reduziu o total
+
+    c_info, c_pag = st.columns([4, 1], vertical_alignment="center")
+    pagina = int(c_pag.number_input("Página", min_value=1, max_value=total_paginas, step=1,
+                                    key="tabela_pagina", label_visibility="collapsed"))
+    inicio = (pagina - 1) * tamanho
+    df_pagina = df_tabela.iloc[inicio:inicio + tamanho]
+    c_info.caption(f"{inicio + 1}–{inicio + len(df_pagina)} de {total} atividades · página {pagina}/{total_paginas}")
+
+    # Só a página atual vai para o navegador; a edição parte da linha selecionada
+    evento = st.dataframe(
+        df_pagina[list(COLUNAS_TABELA)].rename(columns=COLUNAS_TABELA).astype({'Situação': str}),
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"tabela_atividades_{pagina}",
+    )
+
+    linhas = evento.selection.rows
+    idx_selecionado = df_pagina.index[linhas[0]] if linhas else None
+    arquivada = idx_selecionado is not None and idx_selecionado not in df_agenda.index
+    if arquivada:
+        st.caption("Atividade arquivada: somente leitura.")
+    if st.button("✎ Editar atividade selecionada", disabled=idx_selecionado is None or arquivada):
+        modal_editar_atividade(idx_selecionado, df_agenda, lista_time, recursos, atribuicoes)
+
+# --- PREPARAÇÃO DA AGENDA / CONSULTA POR PERÍODO ---
+# Margem carregada além do zoom, para o "pan" mostrar as barras vizinhas
+MARGEM_CONSULTA = timedelta(days=60)
+
+def preparar_recursos(df_agenda, atribuicoes):
+    # Índice por recurso (verificação nos modais) + as atribuições com datas, de onde o
+    # relatório de conflitos sai sob demanda. Parte da TabelaAtribuicoes (Executantes já
+    # separados e codificados)
+    datadas = conflitos_mod.atribuicoes_com_datas(atribuicoes, df_agenda)
+    return conflitos_mod.AgendaRecursos(datadas, atribuicoes.nomes), datadas
+
+@conexao.cache_por_versao('recursos')
+def _preparar_recursos_em_cache(versao, _df_agenda, _atribuicoes):
+    # Chave: versões da Agenda, do Time e da Frota
+    return preparar_recursos(_df_agenda, _atribuicoes)
+
+# A tabela do relatório para aqui; o total continua no aviso
+LIMITE_CONFLITOS = 500
+
+def conflitos_no_periodo(datadas, nomes, zoom_ini, zoom_fim):
+    # Só as atribuições que tocam o período, e só os conflitos dentro dele
+    zoom_ini, zoom_fim = pd.Timestamp(zoom_ini), pd.Timestamp(zoom_fim)
+    no_periodo = datadas[(datadas['inicio'] <= zoom_fim) & (datadas['fim'] >= zoom_ini)]
+    df_conflitos = conflitos_mod.detectar_conflitos(no_periodo, nomes)
+    if df_conflitos.empty:
+        return df_conflitos
+    inicio = pd.to_datetime(df_conflitos['inicio'])
+    fim = pd.to_datetime(df_conflitos['fim'])
+    return df_conflitos[(inicio <= zoom_fim) & (fim >= zoom_ini)].reset_index(drop=True)
+
+def relatorio_conflitos(datadas, nomes, df_agenda, zoom_ini, zoom_fim):
+    # Calculado só quando pedido: na agenda inteira o relatório chega a milhões de linhas
+    with st.expander("⚠️ Conflitos de agenda no período"):
+        if not st.toggle("Verificar conflitos", key="ver_conflitos"):
+            return
+        with metricas.medir("planejamento.conflitos"):
+            df_conflitos = conflitos_no_periodo(datadas, nomes, zoom_ini, zoom_fim)
+        if df_conflitos.empty:
+            st.success("Nenhum conflito no período.")
+            return
+        if len(df_conflitos) > LIMITE_CONFLITOS:
+            st.warning(f"{len(df_conflitos)} conflitos no período; mostrando os primeiros {LIMITE_CONFLITOS}.")
+            df_conflitos = df_conflitos.head(LIMITE_CONFLITOS)
+        else:
+            st.caption(f"{len(df_conflitos)} conflito(s) no período.")
+        projetos = df_agenda['Projeto']
+        st.dataframe(
+            pd.DataFrame({
+                'Tipo': df_conflitos['tipo'].map(conflitos_mod.ROTULOS_TIPO),
+                'Recurso': df_conflitos['recurso'],
+                'Atividade A': projetos.reindex(df_conflitos['atividade_a']).to_numpy(),
+                'Atividade B': projetos.reindex(df_conflitos['atividade_b']).to_numpy(),
+                'De': pd.to_datetime(df_conflitos['inicio']).dt.strftime('%d/%m/%Y'),
+                'Até': pd.to_datetime(df_conflitos['fim']).dt.strftime('%d/%m/%Y'),
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
+
+@metricas.cronometrado("planejamento.preparar_agenda")
+def preparar_agenda(df_agenda):
+    # A Agenda já vem tipada (conexao.normalizar_agenda): aqui só se monta o índice por período
+    df_agenda = df_agenda.copy()
+    indice = IndiceIntervalos(df_agenda['Data Início'], df_agenda['Data Fim'], df_agenda.index)
+    return df_agenda, indice
+
+@conexao.cache_por_versao('agenda_preparada', max_entries=4)
+def _preparar_agenda_em_cache(versao, _df_agenda):
+    # Chave: versão da Agenda tipada
+    return preparar_agenda(_df_agenda)
+
+@conexao.cache_por_versao('arquivo_preparado')
+def preparar_arquivo(versao, _df_arquivo):
+    # Rótulos negativos: não colidem com os da Agenda viva e marcam a linha como arquivada.
+    # Chave: versão do arquivo
+    df_arquivo = _df_arquivo.reset_index(drop=True)
+    df_arquivo.index = -1 - df_arquivo.index
+    if df_arquivo.empty or 'Data Início' not in df_arquivo.columns:
+        return df_arquivo, IndiceIntervalos([], [], [])
+    indice = IndiceIntervalos(df_arquivo['Data Início'], df_arquivo['Data Fim'], df_arquivo.index)
+    return df_arquivo, indice
+
+def janela_arquivo(zoom_ini, zoom_fim, hoje):
+    # Atividades arquivadas no período visível (None se o zoom não chega ao arquivo)
+    if zoom_ini - MARGEM_CONSULTA >= conexao.limite_arquivo(hoje):
+        return None
+    df_arquivo = conexao.carregar_arquivo()
+    df_arquivo, indice = preparar_arquivo(conexao.versao_dados(df_arquivo), df_arquivo)
+    if not len(indice):
+        return None
+    return processar_janela(df_arquivo, indice, zoom_ini, zoom_fim, hoje)
+
+# --- ETAPAS DO CRONOGRAMA (funções puras: usadas pelo app e pelo benchmark) ---
+@metricas.cronometrado("planejamento.classificar")
+def processar_janela(df_agenda, indice, zoom_ini, zoom_fim, hoje):
+    # Só as atividades que cruzam o período visível (+ margem para o "pan") seguem adiante
+    df_processado = df_agenda.loc[indice.consultar(zoom_ini - MARGEM_CONSULTA, zoom_fim + MARGEM_CONSULTA)].copy()
+    df_processado['Fim_Visual'] = df_processado['Data Fim'] + timedelta(days=1)
+    df_processado['Inicio_Fmt'] = df_processado['Data Início'].dt.strftime('%d/%m/%Y')
+    df_processado['Fim_Fmt'] = df_processado['Data Fim'].dt.strftime('%d/%m/%Y')
+    df_processado[['Situacao', 'CorFill', 'CorLine']] = classificar_situacao(df_processado['Data Início'], df_processado['Data Fim'], hoje)
+    return df_processado
+
+def filtrar_recursos(df_processado, atribuicoes, pessoas, veiculos):
+    # Atividades com alguma das pessoas/veículos escolhidos (consulta na tabela de atribuições).
+    # Linhas arquivadas (rótulo negativo) usam uma tabela da própria janela, com os mesmos códigos
+    if not pessoas and not veiculos:
+        return df_processado
+    arquivadas = df_processado.index < 0
+    partes = [atribuicoes.filtrar(df_processado.loc[~arquivadas], pessoas, veiculos)]
+    if arquivadas.any():
+        df_arquivadas = df_processado.loc[arquivadas]
+        partes.append(atribuicoes.para(df_arquivadas).filtrar(df_arquivadas, pessoas, veiculos))
+    return pd.concat(partes) if len(partes) > 1 else partes[0]
+
+def filtrar_e_ordenar(df_processado, filtro_situacao):
+    df_filtrado = df_processado.loc[df_processado['Situacao'].isin(filtro_situacao)].copy()
+    mapa_ordem = {"Em Andamento": 1, "Não Iniciada": 2, "Concluída": 3}
+    df_filtrado['Ordem'] = df_filtrado['Situacao'].map(mapa_ordem).astype(float)
+    return df_filtrado.sort_values(by=['Ordem', 'Data Início'])
+
+# --- FIGURA MEMOIZADA ---
+# Abrir/fechar um modal, paginar a tabela etc. refaz o script, mas não muda o gráfico:
+# a figura é reaproveitada enquanto a chave (versão dos dados, zoom, filtros, hoje) for a mesma.
+# LRU limitado e compartilhado entre sessões (a figura não é alterada depois de montada).
+MAX_FIGURAS = 16
+
+class CacheFiguras:
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self._figuras = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, chave, montar):
+        # chave None (versão desconhecida): monta sem guardar
+        if chave is not None:
+            with self._lock:
+                if chave in self._figuras:
+                    self._figuras.move_to_end(chave)
+                    self.hits += 1
+                    return self._figuras[chave]
+                self.misses += 1
+        metricas.miss_cache('figura')
+        fig = montar()
+        if chave is not None:
+            with self._lock:
+                self._figuras[chave] = fig
+                while len(self._figuras) > self.capacidade:
+                    self._figuras.popitem(last=False)
+        return fig
+
+    def info(self):
+        return {'cache': 'figura_lru', 'hits': self.hits, 'misses': self.misses,
+                'tamanho': len(self._figuras), 'capacidade': self.capacidade}
+
+    def limpar(self):
+        with self._lock:
+            self._figuras.clear()
+            self.hits = self.misses = 0
+
+FIGURAS = CacheFiguras(MAX_FIGURAS)
+
+def chave_figura(versao, zoom_ini, zoom_fim, filtro_situacao, filtro_pessoas, filtro_veiculos, hoje, modo='servidor'):
+    # Filtros como conjuntos ordenados: a ordem de seleção não muda o gráfico
+    if versao is None:
+        return None
+    return (modo, versao, zoom_ini, zoom_fim, tuple(sorted(filtro_situacao)),
+            tuple(sorted(filtro_pessoas)), tuple(sorted(filtro_veiculos)), hoje)
+
+@metricas.cronometrado("planejamento.montar_figura")
+def montar_figura(df_filtrado, zoom_ini, zoom_fim, hoje, por_situacao=False, periodo_fundo=None):
+    # por_situacao: um trace por situação (a legenda liga/desliga cada uma no navegador)
+    # periodo_fundo: (início, fim) do fundo do calendário, se for além do zoom inicial
+    qtd_projetos = len(df_filtrado['Projeto'].unique())
+    altura_final = 100 + (qtd_projetos * 50)
+
+    fig = px.timeline(
+        df_filtrado, 
+        x_start="Data Início", 
+        x_end="Fim_Visual",
+        y="Projeto",
+        text="Projeto",
+        height=altura_final,
+        custom_data=['Inicio_Fmt', 'Fim_Fmt', 'Cliente', 'Descrição', 'Executantes'],
+        **(dict(color=df_filtrado['Situacao'].astype(str),
+                color_discrete_map={s: cores[0] for s, cores in CORES_SITUACAO.items()}) if por_situacao else {})
+    )
+
+    fig.update_layout(
+        hoverlabel=dict(bgcolor="#333333", font_color="white", font_size=12, font_family="sans-serif", bordercolor="#333333")
+    )
+
+    # Com um trace só as cores vêm por linha; por situação cada trace já tem a sua
+    if por_situacao:
+        por_linha = {}
+        fig.for_each_trace(lambda t: t.update(marker_line_color=CORES_SITUACAO[t.name][1]))
+    else:
+        por_linha = dict(
+            customdata=df_filtrado[['Inicio_Fmt', 'Fim_Fmt', 'Cliente', 'Descrição', 'Executantes']],
+            marker_color=df_filtrado['CorFill'].astype(str),
+            marker_line_color=df_filtrado['CorLine'].astype(str),
+        )
+
+    fig.update_traces(
+        hovertemplate="<b>%{y}</b><br><br>" +
+                      "Início: %{customdata[0]}<br>" +
+                      "Término: %{customdata[1]}<br>" +
+                      "Cliente: %{customdata[2]}<br>" +
+                      "Descrição: %{customdata[3]}<br>" +
+                      "Equipe: %{customdata[4]}<extra></extra>",
+        marker=dict(line=dict(width=1), cornerradius=10),
+        textposition='inside', 
+        insidetextanchor='start',
+        textfont=dict(color='white', weight='bold', size=13),
+        constraintext='none', 
+        cliponaxis=False,
+        **por_linha
+    )
+
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color="white", family="sans-serif"),
+        dragmode="pan", 
+        xaxis=dict(
+            title=None,
+            tickformat="%d/%m", 
+            side="top",         
+            showgrid=True,
+            gridcolor='#333333',
+            dtick=86400000.0,    
+            range=[zoom_ini, zoom_fim], 
+            ticklabelmode="period", 
+            tickcolor='white',
+            tickfont=dict(color='#cccccc', size=12)
+        ),
+        yaxis=dict(
+            title=None,
+            autorange="reversed", 
+            showgrid=False,
+            showticklabels=False, 
+            visible=True,
+            type='category',
+            fixedrange=True
+        ),
+        margin=dict(t=50, b=10, l=0, r=0),
+        showlegend=False,
+        bargap=0.2 
+    )
+
+    shapes, anotacoes = camadas_calendario(*(periodo_fundo or (zoom_ini, zoom_fim)), hoje)
+    fig.update_layout(shapes=list(shapes), annotations=list(anotacoes))
+
+    return fig
+
+# --- GANTT COM ZOOM E STATUS NO NAVEGADOR ---
+# Uma figura por versão dos dados cobrindo todos os períodos predefinidos, com um trace por
+# situação: os períodos viram botões "relayout" (muda só o eixo X) e as situações, a legenda
+# e um menu "restyle" (muda só a visibilidade). Nada disso gera rerun no servidor.
+
+def periodo_navegador(hoje):
+    periodos = periodos_predefinidos(hoje).values()
+    return min(ini for _, ini, _ in periodos), max(fim for _, _, fim in periodos)
+
+@metricas.cronometrado("planejamento.montar_figura_navegador")
+def montar_figura_navegador(df_filtrado, hoje, modo_inicial='30d'):
+    periodos = periodos_predefinidos(hoje)
+    _, zoom_ini, zoom_fim = periodos[modo_inicial]
+    # Fundo do calendário para todos os períodos, não só o inicial
+    fig = montar_figura(df_filtrado, zoom_ini, zoom_fim, hoje, por_situacao=True,
+                        periodo_fundo=periodo_navegador(hoje))
+
+    situacoes = [trace.name for trace in fig.data]
+    botoes_zoom = [dict(label=rotulo, method="relayout", args=[{"xaxis.range": [ini.isoformat(), fim.isoformat()]}])
+                      for rotulo, ini, fim in periodos.values()]
+    botoes_status = [dict(label="Todos os status", method="restyle", args=[{"visible": [True] * len(situacoes)}])]
+    botoes_status += [dict(label=situacao, method="restyle", args=[{"visible": [s == situacao for s in situacoes]}])
+                      for situacao in situacoes]
+
+    # Menus e legenda numa faixa acima do eixo de datas (y em fração da área do gráfico)
+    altura = fig.layout.height + 50
+    y_faixa = 1 + 60 / max(altura - 110, 1)
+    estilo_menu = dict(bgcolor="#262730", bordercolor="#555555", font=dict(color="white"), pad=dict(t=0, b=0),
+                       y=y_faixa, yanchor="bottom")
+    fig.update_layout(
+        showlegend=True,
+        legend=dict(orientation="h", title=None, y=y_faixa, yanchor="bottom", xanchor="right", x=1,
+                    itemclick="toggle", itemdoubleclick="toggleothers"),
+        updatemenus=[
+            dict(type="buttons", direction="right", buttons=botoes_zoom, showactive=True,
+                 active=list(periodos).index(modo_inicial), x=0, xanchor="left", **estilo_menu),
+            dict(type="dropdown", buttons=botoes_status, showactive=True, x=0.45, xanchor="left", **estilo_menu),
+        ],
+        margin=dict(t=100, b=10, l=0, r=0),
+        height=altura,
+        uirevision="cronograma_navegador",  # Reenvios (ex.: paginar a tabela) mantêm zoom/legenda do usuário
+    )
+    return fig
 
 # --- APP PRINCIPAL ---
 def app():
@@ -241,214 +708,104 @@ def app():
     col_titulo, col_btn = st.columns([4, 1])
     col_titulo.header("Cronograma")
     
-    df_raw, df_frota, df_time, df_obras_raw = conexao.carregar_dados()
-    df_agenda = df_raw.copy()
-    df_obras = df_obras_raw.copy()
+    df_agenda_tipada, df_frota, df_time, _, _ = conexao.carregar_dados()
+    versao_agenda = conexao.versao_dados(df_agenda_tipada)  # Chave dos caches derivados da Agenda
+    versao_recursos = conexao.versao_dados(df_agenda_tipada, df_time, df_frota)
     
-    lista_time_completa = df_time['Nome'].dropna().unique().tolist() if not df_time.empty and 'Nome' in df_time.columns else []
+    lista_time_completa = conexao.lista_pessoas(df_time)
 
     with col_btn:
         if st.button("Novo Agendamento", type="primary", use_container_width=True):
-            modal_agendamento(df_obras, df_frota, df_time, df_agenda)
+            recursos = None
+            if not df_agenda_tipada.empty:
+                atribuicoes = conexao.carregar_atribuicoes(df_agenda_tipada, df_time, df_frota)
+                recursos = _preparar_recursos_em_cache(versao_recursos, df_agenda_tipada, atribuicoes)[0]
+            modal_agendamento(conexao.carregar_catalogo_projetos(), df_frota, df_time, df_agenda_tipada.copy(), recursos)
 
-    if df_agenda.empty:
+    if df_agenda_tipada.empty:
         st.info("Nenhum agendamento.")
         return
 
     try:
-        df_agenda['Data Início'] = pd.to_datetime(df_agenda['Data Início'], format='mixed', dayfirst=True, errors='coerce')
-        df_agenda['Data Fim'] = pd.to_datetime(df_agenda['Data Fim'], format='mixed', dayfirst=True, errors='coerce')
-        df_agenda['Projeto'] = df_agenda['Projeto'].astype(str).str.replace(r'\.0$', '', regex=True)
-        # Limpeza de dados nulos antes do processamento
-        df_agenda = df_agenda.fillna("")
-        df_processado = df_agenda.dropna(subset=['Data Início', 'Data Fim'])
+        df_agenda, indice = _preparar_agenda_em_cache(versao_agenda, df_agenda_tipada)
+        atribuicoes = conexao.carregar_atribuicoes(df_agenda_tipada, df_time, df_frota)
+        recursos, datadas = _preparar_recursos_em_cache(versao_recursos, df_agenda_tipada, atribuicoes)
     except Exception as e:
         st.error(f"Erro: {e}")
         return
 
-    if df_processado.empty:
+    if not len(indice):
         st.warning("Sem dados válidos.")
         return
-    
-    df_processado['Fim_Visual'] = df_processado['Data Fim'] + timedelta(days=1)
-    df_processado['Inicio_Fmt'] = df_processado['Data Início'].dt.strftime('%d/%m/%Y')
-    df_processado['Fim_Fmt'] = df_processado['Data Fim'].dt.strftime('%d/%m/%Y')
 
-    df_processado[['Situacao', 'CorFill', 'CorLine']] = df_processado.apply(calcular_situacao_e_cores, axis=1)
+    hoje = conexao.get_hoje()
+    iniciar_periodo(hoje)
+
+    # Modo "no navegador": o gráfico vem com todos os períodos predefinidos e todas as
+    # situações; trocar o zoom ou esconder uma situação não volta ao servidor
+    no_navegador = st.toggle("Zoom e status no navegador", key="gantt_navegador",
+                             help="Os botões de período e o filtro de status passam para o próprio gráfico "
+                                  "(legenda e menus), sem recarregar a página. A tabela e o relatório de "
+                                  "conflitos não acompanham: mostram todos os períodos predefinidos e todos os status.")
+    if no_navegador:
+        modo_inicial = st.session_state['view_mode'] if st.session_state['view_mode'] in periodos_predefinidos(hoje) else '30d'
+        zoom_ini, zoom_fim = periodo_navegador(hoje)
+    else:
+        zoom_ini, zoom_fim = st.session_state['zoom_ini'], st.session_state['zoom_fim']
 
-    hoje = get_hoje()
-    if 'view_mode' not in st.session_state: st.session_state['view_mode'] = '30d'
-    if 'zoom_ini' not in st.session_state: st.session_state['zoom_ini'] = hoje
-    if 'zoom_fim' not in st.session_state: st.session_state['zoom_fim'] = hoje + timedelta(days=30)
+    df_processado = processar_janela(df_agenda, indice, zoom_ini, zoom_fim, hoje)
+    try:
+        df_arquivadas = janela_arquivo(zoom_ini, zoom_fim, hoje)
+    except Exception as e:
+        st.warning(f"Não foi possível ler o arquivo de atividades antigas: {e}")
+        df_arquivadas = None
+    if df_arquivadas is not None and not df_arquivadas.empty:
+        df_processado = pd.concat([df_processado, df_arquivadas])
 
     st.divider()
-    c_botoes, c_status = st.columns([2, 1])
-    
-    with c_botoes:
-        b1, b2, b3, b4 = st.columns(4)
-        if b1.button("30 Dias", use_container_width=True, type="primary" if st.session_state['view_mode']=='30d' else "secondary"):
-            st.session_state['zoom_ini'] = hoje
-            st.session_state['zoom_fim'] = hoje + timedelta(days=30)
-            st.session_state['view_mode'] = '30d'
-            st.rerun()
-        if b2.button("Mês Atual", use_container_width=True, type="primary" if st.session_state['view_mode']=='mes' else "secondary"):
-            st.session_state['zoom_ini'] = hoje.replace(day=1)
-            _, last = calendar.monthrange(hoje.year, hoje.month)
-            st.session_state['zoom_fim'] = hoje.replace(day=last)
-            st.session_state['view_mode'] = 'mes'
-            st.rerun()
-        if b3.button("3 Meses", use_container_width=True, type="primary" if st.session_state['view_mode']=='3m' else "secondary"):
-            st.session_state['zoom_ini'] = hoje
-            st.session_state['zoom_fim'] = hoje + timedelta(days=90)
-            st.session_state['view_mode'] = '3m'
-            st.rerun()
-        if b4.button("Personalizado", use_container_width=True, type="primary" if st.session_state['view_mode']=='custom' else "secondary"):
-            modal_datas_personalizadas()
+    if no_navegador:
+        filtro_situacao = SITUACOES
+    else:
+        c_botoes, c_status = st.columns([2, 1])
 
-    with c_status:
-        situacoes = ["Não Iniciada", "Em Andamento", "Concluída"]
-        filtro_situacao = st.multiselect("Filtrar Status", situacoes, default=situacoes, label_visibility="collapsed", placeholder="Filtrar Status")
+        with c_botoes:
+            botoes_periodo(hoje)
 
-    mask = df_processado['Situacao'].isin(filtro_situacao)
-    df_filtrado = df_processado.loc[mask]
+        with c_status:
+            filtro_situacao = st.multiselect("Filtrar Status", SITUACOES, default=SITUACOES, label_visibility="collapsed", placeholder="Filtrar Status")
 
-    if not df_filtrado.empty:
-        mapa_ordem = {"Em Andamento": 1, "Não Iniciada": 2, "Concluída": 3}
-        df_filtrado['Ordem'] = df_filtrado['Situacao'].map(mapa_ordem)
-        df_filtrado = df_filtrado.sort_values(by=['Ordem', 'Data Início'])
-
-        qtd_projetos = len(df_filtrado['Projeto'].unique())
-        altura_final = 100 + (qtd_projetos * 50)
-
-        fig = px.timeline(
-            df_filtrado, 
-            x_start="Data Início", 
-            x_end="Fim_Visual",
-            y="Projeto",
-            text="Projeto",
-            height=altura_final,
-            custom_data=['Inicio_Fmt', 'Fim_Fmt', 'Cliente', 'Descrição', 'Executantes']
-        )
-        
-        fig.update_layout(
-            hoverlabel=dict(bgcolor="#333333", font_color="white", font_size=12, font_family="sans-serif", bordercolor="#333333")
-        )
-        
-        fig.update_traces(
-            hovertemplate="<b>%{y}</b><br><br>" +
-                          "Início: %{customdata[0]}<br>" +
-                          "Término: %{customdata[1]}<br>" +
-                          "Cliente: %{customdata[2]}<br>" +
-                          "Descrição: %{customdata[3]}<br>" +
-                          "Equipe: %{customdata[4]}<extra></extra>",
-            customdata=df_filtrado[['Inicio_Fmt', 'Fim_Fmt', 'Cliente', 'Descrição', 'Executantes']],
-            marker=dict(
-                color=df_filtrado['CorFill'],
-                line=dict(color=df_filtrado['CorLine'], width=1),
-                cornerradius=10 
-            ),
-            textposition='inside', 
-            insidetextanchor='start',
-            textfont=dict(color='white', weight='bold', size=13),
-            constraintext='none', 
-            cliponaxis=False 
-        )
+    c_pessoas, c_veiculos = st.columns(2)
+    filtro_pessoas = c_pessoas.multiselect("Filtrar Executantes", atribuicoes.nomes[atribuicoes_mod.PESSOA].tolist(),
+                                           label_visibility="collapsed", placeholder="Filtrar Executantes")
+    filtro_veiculos = c_veiculos.multiselect("Filtrar Veículos", atribuicoes.nomes[atribuicoes_mod.VEICULO].tolist(),
+                                             label_visibility="collapsed", placeholder="Filtrar Veículos")
 
-        fig.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font=dict(color="white", family="sans-serif"),
-            dragmode="pan", 
-            xaxis=dict(
-                title=None,
-                tickformat="%d/%m", 
-                side="top",         
-                showgrid=True,
-                gridcolor='#333333',
-                dtick=86400000.0,    
-                range=[st.session_state['zoom_ini'], st.session_state['zoom_fim']], 
-                ticklabelmode="period", 
-                tickcolor='white',
-                tickfont=dict(color='#cccccc', size=12)
-            ),
-            yaxis=dict(
-                title=None,
-                autorange="reversed", 
-                showgrid=False,
-                showticklabels=False, 
-                visible=True,
-                type='category',
-                fixedrange=True
-            ),
-            margin=dict(t=50, b=10, l=0, r=0),
-            showlegend=False,
-            bargap=0.2 
-        )
-
-        fig.add_vrect(x0=hoje, x1=hoje + timedelta(days=1), fillcolor="#00FFFF", opacity=0.15, layer="below", line_width=0)
-        fig.add_annotation(
-            x=hoje, 
-            y=0, 
-            yref="paper", 
-            yanchor="bottom", 
-            text="HOJE", 
-            showarrow=False, 
-            font=dict(color="#00FFFF", weight="bold"), 
-            yshift=0, 
-            xshift=20
-        )
+    df_processado = filtrar_recursos(df_processado, atribuicoes, filtro_pessoas, filtro_veiculos)
+    df_filtrado = filtrar_e_ordenar(df_processado, filtro_situacao)
 
-        min_dados = df_filtrado['Data Início'].min().date()
-        max_dados = df_filtrado['Data Fim'].max().date()
-        visual_inicio = min(st.session_state['zoom_ini'], min_dados) - timedelta(days=180)
-        visual_fim = max(st.session_state['zoom_fim'], max_dados) + timedelta(days=180)
-        
-        curr_date = visual_inicio 
-        while curr_date <= visual_fim: 
-            if curr_date.weekday() in [5, 6]: 
-                fig.add_vrect(x0=curr_date, x1=curr_date + timedelta(days=1), fillcolor="white", opacity=0.08, layer="below", line_width=0)
-            if curr_date.day == 1:
-                fig.add_vline(x=curr_date, line_width=3, line_color="#FFFFFF", opacity=0.8)
-                fig.add_annotation(x=curr_date, y=0, yref="paper", text=f"{curr_date.strftime('%b').upper()}", showarrow=False, font=dict(color="#FFFFFF", size=14, weight="bold"), yshift=-30)
-            curr_date += timedelta(days=1)
-
-        st.plotly_chart(fig, use_container_width=True)
+    if not df_filtrado.empty:
+        versao = conexao.versao_dados(df_agenda_tipada, *([df_arquivadas] if df_arquivadas is not None else []))
+        metricas.acesso_cache('figura')
+        if no_navegador:
+            chave = chave_figura(versao, zoom_ini, zoom_fim, filtro_situacao, filtro_pessoas, filtro_veiculos, hoje,
+                                 modo=('navegador', modo_inicial))
+            fig = FIGURAS.obter(chave, lambda: montar_figura_navegador(df_filtrado, hoje, modo_inicial))
+        else:
+            chave = chave_figura(versao, zoom_ini, zoom_fim, filtro_situacao, filtro_pessoas, filtro_veiculos, hoje)
+            fig = FIGURAS.obter(chave, lambda: montar_figura(df_filtrado, zoom_ini, zoom_fim, hoje))
+        with metricas.medir("planejamento.grafico_envio"):
+            st.plotly_chart(fig, use_container_width=True, config={'scrollZoom': True} if no_navegador else None)
         
         st.divider()
         st.subheader("Detalhamento das Atividades")
+        if no_navegador:
+            st.caption("Zoom e status escolhidos no gráfico não filtram a tabela nem o relatório de conflitos: "
+                       "valem todos os períodos predefinidos e todos os status.")
         
-        # --- TABELA CUSTOMIZADA ---
-        c_proj, c_desc, c_cli, c_ini, c_fim, c_equipe, c_acao = st.columns([2, 3, 2, 1.2, 1.2, 2, 0.8], vertical_alignment="center")
-        c_proj.markdown("**Projeto**")
-        c_desc.markdown("**Descrição**")
-        c_cli.markdown("**Cliente**")
-        c_ini.markdown("**Início**")
-        c_fim.markdown("**Fim**")
-        c_equipe.markdown("**Equipe**")
-        c_acao.markdown("**Editar**")
-        
-        st.markdown("<hr>", unsafe_allow_html=True) 
-
-        for idx, row in df_filtrado.iterrows():
-            with st.container():
-                c1, c2, c3, c4, c5, c6, c7 = st.columns([2, 3, 2, 1.2, 1.2, 2, 0.8], vertical_alignment="center")
-                
-                c1.markdown(f"{row['Projeto']}")
-                
-                # CORREÇÃO DO ERRO TYPE ERROR: USO DE MARKDOWN COM HELP
-                desc_text = str(row['Descrição'])
-                desc_curta = f"{desc_text[:40]}..." if len(desc_text) > 40 else desc_text
-                c2.markdown(f"<span title='{desc_text}'>{desc_curta}</span>", unsafe_allow_html=True)
-                
-                c3.markdown(f"{row['Cliente']}")
-                c4.markdown(f"{row['Inicio_Fmt']}")
-                c5.markdown(f"{row['Fim_Fmt']}")
-                c6.markdown(f"{row['Executantes']}")
-                
-                if c7.button("✎", key=f"btn_edit_{idx}", type="secondary", use_container_width=True):
-                    modal_editar_atividade(idx, df_agenda, lista_time_completa)
-                
-                st.markdown("<hr>", unsafe_allow_html=True) 
+        with metricas.medir("planejamento.tabela"):
+            tabela_atividades(df_filtrado, df_agenda, lista_time_completa, recursos, atribuicoes)
 
     else:
         st.info("Nenhuma atividade encontrada.")
+
+    relatorio_conflitos(datadas, atribuicoes.nomes, df_agenda, zoom_ini, zoom_fim)
@@ -5,8 +5,8 @@ import conexao
 def app():
     st.header("📝 Editor de Agenda (Tabela)")
 
-    # Ajustado para receber 4 valores (incluindo df_time)
-    df_agenda, df_frota, df_time, df_obras = conexao.carregar_dados()
+    # Retorna os 4 DataFrames + tempos de cada etapa do carregamento
+    df_agenda, df_frota, df_time, df_obras, _ = conexao.carregar_dados()
 
     # Define colunas novas
     colunas_novas = ['Projeto', 'Descrição', 'Cliente', 'Data Início', 'Data Fim', 'Executantes', 'Veículo', 'Status']
@@ -14,20 +14,28 @@ def app():
     if df_agenda.empty:
         df_agenda = pd.DataFrame(columns=colunas_novas)
 
+    # Categorias viram texto livre no editor (senão só aceitaria valores já existentes)
+    df_agenda = df_agenda.astype({col: object for col in conexao.COLUNAS_CATEGORIA if col in df_agenda.columns})
+
     # Editor
     df_editado = st.data_editor(
         df_agenda,
         num_rows="dynamic",
         use_container_width=True,
         hide_index=True,
-        key="editor_full"
+        column_config={conexao.COLUNA_ID: None},  # Chave interna, não editável
+        key=f"editor_full_{st.session_state.get('editor_versao', 0)}"
     )
 
     if st.button("💾 Salvar Tudo"):
-        # Tratamento simples de datas antes de salvar
-        df_salvar = df_editado.copy()
-        df_salvar['Data Início'] = pd.to_datetime(df_salvar['Data Início']).dt.strftime('%Y-%m-%d')
-        df_salvar['Data Fim'] = pd.to_datetime(df_salvar['Data Fim']).dt.strftime('%Y-%m-%d')
-        
-        conexao.salvar_no_sheets(df_salvar)
-        st.success("Salvo!")
+        # Só as linhas alteradas/novas/excluídas vão para a fila de gravação
+        alteracoes = conexao.enfileirar_gravacao(df_editado, df_agenda)
+        # Editor novo: as edições já fazem parte da Agenda exibida (não reaplicar por cima)
+        st.session_state['editor_versao'] = st.session_state.get('editor_versao', 0) + 1
+        if alteracoes is None:
+            st.toast("Salvo!")
+        elif alteracoes:
+            st.toast(f"{alteracoes} alteração(ões) enviadas para gravação.")
+        else:
+            st.toast("Nada para salvar.")
+        st.rerun()
@@ -0,0 +1,146 @@
+import threading
+import time
+
+import metricas
+
+# --- DETECÇÃO DE MUDANÇAS POR REVISÃO ---
+# Em vez de expirar o cache por tempo, consulta (barato) a revisão de cada origem e só
+# recarrega o conjunto que mudou. A recarga é única por conjunto (single flight) e roda em
+# segundo plano: enquanto isso as páginas continuam recebendo o valor anterior.
+
+
+class MonitorRevisoes:
+    # consultar(): dict conjunto -> revisão (ou None se a origem não informa revisões)
+    # ao_mudar(revisoes, proprios): chamado na thread da verificação quando alguma revisão muda;
+    # proprios são os conjuntos cuja mudança veio de uma gravação nossa (não precisam recarregar)
+    # compartilhadas: grupos de conjuntos com a mesma revisão na origem (abas de uma planilha)
+
+    def __init__(self, consultar, intervalo, ao_mudar=None, compartilhadas=()):
+        self.consultar = consultar
+        self.intervalo = intervalo
+        self.ao_mudar = ao_mudar
+        self.compartilhadas = compartilhadas
+        self._lock = threading.Lock()
+        self._lock_primeira = threading.Lock()
+        self._valores = None
+        self._verificado_em = None
+
+    def _proprios(self, conjuntos):
+        # Gravar num conjunto muda a revisão de todo o grupo dele. Se alguém alterou outro
+        # conjunto do grupo desde a última verificação, essa mudança só aparece na próxima
+        proprios = set(conjuntos)
+        for grupo in self.compartilhadas:
+            if proprios.intersection(grupo):
+                proprios.update(grupo)
+        return proprios
+
+    def verificar(self, proprios=()):
+        # Consulta agora (bloqueia); em caso de erro mantém as últimas revisões conhecidas.
+        # proprios: conjuntos que quem chama acabou de gravar e vai recarregar ele mesmo
+        with self._lock:
+            anteriores = self._valores
+            try:
+                with metricas.medir("revisoes.verificar"):
+                    valores = self.consultar()
+            except Exception:
+                metricas.contar("revisoes.falhas")
+                valores = anteriores
+            self._valores = valores
+            self._verificado_em = time.monotonic()
+        if anteriores is not None and valores != anteriores:
+            metricas.contar("revisoes.mudancas")
+            if self.ao_mudar is not None:
+                self.ao_mudar(valores, self._proprios(proprios))
+        return valores
+
+    def _verificar_em_segundo_plano(self):
+        if self._lock.locked():
+            return  # Outra sessão já está verificando
+        threading.Thread(target=self.verificar, name="revisoes", daemon=True).start()
+
+    def atuais(self):
+        # Últimas revisões conhecidas; só a primeira chamada espera a consulta
+        if self._verificado_em is None:
+            with self._lock_primeira:
+                if self._verificado_em is None:
+                    return self.verificar()
+            return self._valores
+        if time.monotonic() - self._verificado_em >= self.intervalo:
+            self._verificado_em = time.monotonic()  # Evita disparar várias verificações seguidas
+            self._verificar_em_segundo_plano()
+        return self._valores
+
+
+class ConjuntoVersionado:
+    # Último valor carregado de um conjunto + a revisão da origem na hora da carga
+
+    def __init__(self, nome, carregar):
+        self.nome = nome
+        self.carregar = carregar
+        self._lock = threading.Lock()
+        self._valor = None
+        self._revisao = None
+        self._cargas = 0
+        self._atual = (None, None)
+
+    def _recarregar(self, revisao):
+        # Chamado com o lock: a revisão é lida antes da carga, então uma mudança no meio
+        # só provoca uma recarga a mais, nunca um dado antigo marcado como novo
+        metricas.miss_cache(self.nome)
+        with metricas.medir(f"carregar.{self.nome}"):
+            valor = self.carregar()
+        self._valor, self._revisao = valor, revisao
+        self._cargas += 1
+        self._atual = (valor, (revisao, self._cargas))  # Uma atribuição só: lida sem o lock
+
+    def obter(self, revisao):
+        if self._valor is None:
+            # Nada para servir ainda: espera a carga (quem chegar junto espera a mesma)
+            with self._lock:
+                if self._valor is None:
+                    self._recarregar(revisao)
+            return self._valor
+        if revisao != self._revisao:
+            self.atualizar_em_segundo_plano(revisao)
+        return self._valor
+
+    def atual(self):
+        # (valor, versão) da última carga, lidos juntos (para montar derivados por versão).
+        # A versão inclui o número da carga: uma recarga com a mesma revisão (ex.: logo depois
+        # de uma gravação nossa, ou na janela do TTL) também conta como dado novo.
+        # Não espera a recarga em andamento: devolve a última completa
+        return self._atual
+
+    def recarregar(self, revisao):
+        # Recarga bloqueante (ex.: logo depois de uma gravação nossa)
+        with self._lock:
+            self._recarregar(revisao)
+
+    def atualizar(self, revisao):
+        # Single flight: se já há uma recarga em andamento, não enfileira outra.
+        # Conjunto ainda não carregado fica para o primeiro obter() (ex.: o arquivo)
+        if self._valor is None or revisao == self._revisao or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._recarregar(revisao)
+        except Exception:
+            metricas.contar(f"cache.{self.nome}.falhas_atualizacao")  # Continua servindo o valor anterior
+        finally:
+            self._lock.release()
+
+    def confirmar(self, revisao):
+        # A revisão da origem mudou sem mudar este conjunto (gravação nossa em outro conjunto
+        # da mesma origem): aceita a revisão nova sem recarregar e sem mudar a versão
+        if self._valor is not None:
+            self._revisao = revisao
+
+    def atualizar_em_segundo_plano(self, revisao):
+        if self._lock.locked():
+            return
+        threading.Thread(target=self.atualizar, args=(revisao,), name=f"atualizar-{self.nome}", daemon=True).start()
+
+    def descartar(self):
+        # Próximo obter() recarrega e espera (botão "Limpar Cache")
+        with self._lock:
+            self._valor, self._revisao = None, None
+            self._atual = (None, None)
@@ -0,0 +1,100 @@
+import os
+import sys
+
+import pytest
+import requests
+from gspread.exceptions import APIError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import cliente_google
+import conexao
+
+
+@pytest.fixture(autouse=True)
+def sem_espera(monkeypatch):
+    monkeypatch.setattr(cliente_google, "_orcamentos", {})
+    monkeypatch.setattr(cliente_google, "ESPERA_BASE", 0.0)
+
+
+def _erro_api(status):
+    resposta = requests.Response()
+    resposta.status_code = status
+    resposta._content = b'{"error": {"code": %d, "message": "erro", "status": "X"}}' % status
+    return APIError(resposta)
+
+def _falha_uma_vez(erro):
+    chamadas = []
+    def funcao():
+        chamadas.append(1)
+        if len(chamadas) == 1:
+            raise erro
+        return "ok"
+    return funcao, chamadas
+
+
+def test_leitura_repete_em_timeout():
+    funcao, chamadas = _falha_uma_vez(requests.Timeout())
+    assert cliente_google.executar("sheets.values:batchGet", funcao) == "ok"
+    assert len(chamadas) == 2
+
+def test_gravacao_nao_repete_em_timeout_nem_5xx():
+    for erro in (requests.Timeout(), _erro_api(503)):
+        funcao, chamadas = _falha_uma_vez(erro)
+        with pytest.raises(type(erro)):
+            cliente_google.executar("sheets.batchUpdate", funcao, idempotente=False)
+        assert len(chamadas) == 1
+
+def test_gravacao_repete_em_429():
+    funcao, chamadas = _falha_uma_vez(_erro_api(429))
+    assert cliente_google.executar("sheets.batchUpdate", funcao, idempotente=False) == "ok"
+    assert len(chamadas) == 2
+
+def test_drive_tem_orcamento_proprio(monkeypatch):
+    monkeypatch.setattr(cliente_google, "_orcamentos", {})
+    cliente_google.configurar(60, 10, 300, 20)
+    assert cliente_google._orcamento("sheets.values:batchGet").taxa == 1.0
+    assert cliente_google._orcamento("drive.files.list").taxa == 5.0
+
+
+class PlanilhaQueAplicaEFalha(benchmark.PlanilhaLocal):
+    # Aplica appendCells/updateCells na aba Agenda e, na primeira vez, responde com timeout
+    def __init__(self, abas):
+        super().__init__(abas)
+        self.falhas = 1
+
+    def batch_update(self, corpo):
+        agenda = self.valores['Agenda']
+        for req in corpo['requests']:
+            if 'appendCells' in req:
+                for linha in req['appendCells']['rows']:
+                    agenda.append([str(list(v['userEnteredValue'].values())[0]) for v in linha['values']])
+            elif 'updateCells' in req:
+                faixa = req['updateCells']['range']
+                valores = req['updateCells']['rows'][0]['values']
+                for k, v in enumerate(valores):
+                    agenda[faixa['startRowIndex']][faixa['startColumnIndex'] + k] = \
+                        str(list(v['userEnteredValue'].values())[0])
+        resposta = super().batch_update(corpo)
+        if self.falhas:
+            self.falhas -= 1
+            raise requests.Timeout()
+        return resposta
+
+
+def test_gravacao_com_timeout_refaz_o_diff_sem_duplicar():
+    df_agenda = benchmark.gerar_dados(50)[0]
+    planilha = PlanilhaQueAplicaEFalha({'Agenda': df_agenda})
+    google = conexao.ArmazenamentoGoogle(planilha, None)
+
+    df_raw = google.carregar_agenda()
+    nova = df_raw.iloc[[0]].assign(**{conexao.COLUNA_ID: conexao.gerar_id(), 'Descrição': "Nova"})
+    df_novo = conexao.serializar_agenda(conexao.pd.concat([df_raw, nova], ignore_index=True))
+    google.salvar_agenda(df_novo, df_raw)
+
+    df_final = google.carregar_agenda()
+    assert len(planilha.requisicoes) == 2
+    assert 'appendCells' not in str(planilha.requisicoes[1])
+    assert len(df_final) == len(df_raw) + 1
+    assert df_final[conexao.COLUNA_ID].is_unique
@@ -0,0 +1,143 @@
+import os
+import random
+import sys
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import armazenamento
+import atribuicoes
+import conflitos
+import ocupacao
+import planejamento
+from intervalos import IndiceIntervalos
+
+# Agendas pequenas e aleatórias, conferidas contra a definição direta (laço por par / por dia).
+# Período curto e poucos recursos: sobreposições, intervalos que se tocam e NaT são comuns.
+
+PESSOAS = ["Ana", "Bruno", "Caio", "Dani"]
+VEICULOS = ["ABC1234", "XYZ9876"]
+INICIO = date(2026, 3, 1)
+SEMENTES = range(20)
+
+
+def _data(rng):
+    if rng.random() < 0.1:
+        return pd.NaT
+    return pd.Timestamp(INICIO + timedelta(days=rng.randrange(20)))
+
+def _agenda(rng, linhas=25):
+    registros = []
+    for _ in range(linhas):
+        inicio = _data(rng)
+        fim = inicio + timedelta(days=rng.randrange(4)) if pd.notna(inicio) and rng.random() < 0.9 else _data(rng)
+        registros.append({
+            'Projeto': str(rng.randrange(1000)),
+            'Data Início': inicio,
+            'Data Fim': fim,
+            'Executantes': ", ".join(rng.sample(PESSOAS, rng.randrange(3))),
+            'Veículo': rng.choice(VEICULOS + [""]),
+        })
+    df = pd.DataFrame(registros)
+    df['Data Início'] = pd.to_datetime(df['Data Início'])
+    df['Data Fim'] = pd.to_datetime(df['Data Fim'])
+    df.index = rng.sample(range(1000), len(df))  # Rótulos fora de ordem, como depois de filtros
+    return df
+
+def _recursos(linha):
+    pessoas = [p.strip() for p in linha['Executantes'].split(",") if p.strip()]
+    return [(atribuicoes.PESSOA, p) for p in pessoas] + ([(atribuicoes.VEICULO, linha['Veículo'])] if linha['Veículo'] else [])
+
+def _valida(linha):
+    return pd.notna(linha['Data Início']) and pd.notna(linha['Data Fim'])
+
+
+@pytest.mark.parametrize("semente", SEMENTES)
+def test_detectar_conflitos(semente):
+    df = _agenda(random.Random(semente))
+    tabela = atribuicoes.TabelaAtribuicoes(df, PESSOAS, VEICULOS)
+    datadas = conflitos.atribuicoes_com_datas(tabela, df)
+    obtidos = conflitos.detectar_conflitos(datadas, tabela.nomes)
+
+    esperados = set()
+    linhas = list(df.iterrows())
+    for a, (rotulo_a, linha_a) in enumerate(linhas):
+        for rotulo_b, linha_b in linhas[a + 1:]:
+            if not (_valida(linha_a) and _valida(linha_b)):
+                continue
+            inicio = max(linha_a['Data Início'], linha_b['Data Início'])
+            fim = min(linha_a['Data Fim'], linha_b['Data Fim'])
+            if inicio > fim:  # Quem termina num dia e quem começa no seguinte não conflitam
+                continue
+            # Só o recurso em comum: pessoa/veículo diferentes no mesmo período não conflitam
+            for tipo, recurso in set(_recursos(linha_a)) & set(_recursos(linha_b)):
+                esperados.add((tipo, recurso, frozenset((rotulo_a, rotulo_b)), inicio, fim))
+
+    assert {(t, r, frozenset((a, b)), pd.Timestamp(i), pd.Timestamp(f))
+            for t, r, a, b, i, f in obtidos.itertuples(index=False)} == esperados
+    assert len(obtidos) == len(esperados)
+
+
+@pytest.mark.parametrize("semente", SEMENTES)
+def test_indice_intervalos(semente):
+    rng = random.Random(semente)
+    df = _agenda(rng)
+    indice = IndiceIntervalos(df['Data Início'], df['Data Fim'], df.index)
+    assert len(indice) == sum(_valida(linha) for _, linha in df.iterrows())
+
+    for _ in range(30):
+        inicio = pd.Timestamp(INICIO + timedelta(days=rng.randrange(-3, 23)))
+        fim = inicio + timedelta(days=rng.randrange(5))
+        esperados = [rotulo for rotulo, linha in df.iterrows()
+                     if _valida(linha) and linha['Data Início'] <= fim and linha['Data Fim'] >= inicio]
+        assert indice.consultar(inicio, fim).tolist() == esperados
+
+
+@pytest.mark.parametrize("semente", SEMENTES)
+def test_matrizes_ocupacao(semente):
+    rng = random.Random(semente)
+    df = _agenda(rng)
+    tabela = atribuicoes.TabelaAtribuicoes(df, PESSOAS, VEICULOS)
+    inicio = INICIO + timedelta(days=rng.randrange(10))
+    fim = inicio + timedelta(days=rng.randrange(12))
+    matrizes = ocupacao.matrizes_ocupacao(tabela, df, inicio, fim)
+
+    dias = pd.date_range(inicio, fim)
+    for tipo, nomes in tabela.nomes.items():
+        esperada = [[sum(1 for _, linha in df.iterrows()
+                         if _valida(linha) and (tipo, nome) in _recursos(linha)
+                         and linha['Data Início'] <= dia <= linha['Data Fim'])
+                     for dia in dias] for nome in nomes]
+        assert matrizes[tipo].tolist() == esperada
+
+
+def test_converter_datas():
+    textos = ["05/03/2026", "2026-03-05", "2026-03-05 00:00:00", "31/12/2025", "2025-12-31",
+              "1/2/2026", "", "nan", "abc", "31/02/2026", "2026-02-31"]
+    esperadas = [datetime(2026, 3, 5), datetime(2026, 3, 5), datetime(2026, 3, 5), datetime(2025, 12, 31),
+                 datetime(2025, 12, 31), datetime(2026, 2, 1), None, None, None, None, None]
+    obtidas = armazenamento.converter_datas(pd.Series(textos))
+    assert [None if pd.isna(d) else d.to_pydatetime() for d in obtidas] == esperadas
+
+
+@pytest.mark.parametrize("semente", SEMENTES)
+def test_classificar_situacao(semente):
+    df = _agenda(random.Random(semente))
+    hoje = INICIO + timedelta(days=10)
+    obtidas = planejamento.classificar_situacao(df['Data Início'], df['Data Fim'], hoje)
+
+    hoje = pd.Timestamp(hoje)
+    for rotulo, linha in df.iterrows():
+        if not _valida(linha):
+            esperada = "Erro"
+        elif linha['Data Início'] > hoje:
+            esperada = "Não Iniciada"
+        elif linha['Data Fim'] < hoje:
+            esperada = "Concluída"
+        else:
+            esperada = "Em Andamento"  # Inclui começar ou terminar hoje
+        assert obtidas.at[rotulo, 'Situacao'] == esperada
+        assert obtidas.at[rotulo, 'CorFill'] == planejamento.CORES_SITUACAO[esperada][0]
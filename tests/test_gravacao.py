@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import conexao
+import fila_gravacao
+
+COLUNAS = [conexao.COLUNA_ID, "Projeto", "Descrição", "Cliente", "Executantes"]
+SHEET_ID = 7
+
+
+def _agenda(linhas):
+    return pd.DataFrame(linhas, columns=COLUNAS)
+
+def _base():
+    return _agenda([["a1", "100", "Poste", "Cemig", "Ana"],
+                    ["a2", "200", "Cabo", "Copel", "Bruno"],
+                    ["a3", "300", "Trafo", "Light", "Caio"]])
+
+def _ids(df):
+    # Coluna ID da planilha como está gravada (posição 0 = cabeçalho)
+    return [conexao.COLUNA_ID] + df[conexao.COLUNA_ID].tolist()
+
+def _diff(df_novo, df_base):
+    return conexao.montar_requisicoes_diff(df_novo, df_base, _ids(df_base), SHEET_ID)
+
+def _valores(requisicao):
+    return [list(v['userEnteredValue'].values())[0] for v in requisicao['values']]
+
+
+def test_sem_alteracao_nao_gera_requisicoes():
+    assert _diff(_base(), _base()) == []
+
+
+def test_editar_uma_celula():
+    df_novo = _base()
+    df_novo.loc[1, "Cliente"] = "CPFL"
+    requisicoes = _diff(df_novo, _base())
+    assert requisicoes == [{"updateCells": {
+        "range": {"sheetId": SHEET_ID, "startRowIndex": 2, "endRowIndex": 3,
+                  "startColumnIndex": 3, "endColumnIndex": 4},
+        "rows": [{"values": [{"userEnteredValue": {"stringValue": "CPFL"}}]}],
+        "fields": "userEnteredValue"}}]
+
+
+def test_celulas_vizinhas_da_mesma_linha_viram_um_trecho():
+    df_novo = _base()
+    df_novo.loc[0, ["Descrição", "Cliente"]] = ["Poste novo", "CPFL"]
+    df_novo.loc[0, "Projeto"] = "101"
+    df_novo.loc[2, "Executantes"] = "Dani"
+    requisicoes = [r['updateCells'] for r in _diff(df_novo, _base())]
+    assert [(r['range']['startRowIndex'], r['range']['startColumnIndex'], r['range']['endColumnIndex'])
+            for r in requisicoes] == [(1, 1, 4), (3, 4, 5)]
+    assert _valores(requisicoes[0]['rows'][0]) == ["101", "Poste novo", "CPFL"]
+
+
+def test_linha_nova_recebe_id_gerado_e_vai_para_o_final():
+    nova = _agenda([["", "400", "Medidor", "Enel", "Edu"]])
+    df_novo = conexao.garantir_ids(pd.concat([_base(), nova], ignore_index=True))
+    id_novo = df_novo[conexao.COLUNA_ID].iloc[-1]
+    assert id_novo[0].isalpha()
+
+    requisicoes = _diff(df_novo, _base())
+    assert len(requisicoes) == 1
+    linhas = requisicoes[0]['appendCells']['rows']
+    assert [_valores(linha) for linha in linhas] == [[id_novo, "400", "Medidor", "Enel", "Edu"]]
+
+
+def test_excluir_e_acrescentar_no_mesmo_lote():
+    df_novo = pd.concat([_base().drop(index=[0, 1]), _agenda([["a4", "400", "Medidor", "Enel", "Edu"]])],
+                        ignore_index=True)
+    requisicoes = _diff(df_novo, _base())
+    # Exclusões de baixo para cima (as posições de cima continuam válidas), depois o acréscimo
+    assert [next(iter(r)) for r in requisicoes] == ["deleteDimension", "deleteDimension", "appendCells"]
+    assert [r['deleteDimension']['range']['startIndex'] for r in requisicoes[:2]] == [2, 1]
+    assert _valores(requisicoes[2]['appendCells']['rows'][0])[0] == "a4"
+
+
+def test_consolidar_edicoes_repetidas_da_mesma_linha():
+    operacoes = [
+        {'id': "a1", 'tipo': fila_gravacao.SALVAR, 'dados': {"Cliente": "CPFL", "Executantes": "Ana"}},
+        {'id': "a2", 'tipo': fila_gravacao.EXCLUIR, 'dados': {}},
+        {'id': "a1", 'tipo': fila_gravacao.SALVAR, 'dados': {"Cliente": "Enel"}},
+        {'id': "a1", 'tipo': fila_gravacao.SALVAR, 'dados': {"Descrição": "Poste novo"}},
+    ]
+    atividades, exclusoes = fila_gravacao.consolidar_operacoes(operacoes)
+    assert atividades == {"a1": {"Cliente": "Enel", "Executantes": "Ana", "Descrição": "Poste novo"}}
+    assert exclusoes == {"a2"}
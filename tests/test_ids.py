@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import conexao
+
+
+def test_ids_gerados_voltam_iguais_da_planilha():
+    ids = [conexao.gerar_id() for _ in range(20000)]
+    valores = [[conexao.COLUNA_ID, "Projeto"]] + [[i, "1234"] for i in ids]
+    df = conexao._valores_para_df(valores)
+    assert df[conexao.COLUNA_ID].tolist() == ids
+    assert df["Projeto"].tolist() == [1234] * len(ids)  # As demais colunas continuam numéricas
+
+
+def test_ids_antigos_com_cara_de_numero_continuam_texto():
+    ids = ["012345678901", "12e345678901", "123456789012"]
+    df = conexao._valores_para_df([[conexao.COLUNA_ID]] + [[i] for i in ids])
+    assert df[conexao.COLUNA_ID].tolist() == ids
+
+
+def test_editar_uma_atividade_nao_duplica_linhas():
+    df_agenda = benchmark.gerar_dados(200)[0]
+    df_agenda[conexao.COLUNA_ID] = ["012345678901", "12e345678901"] + \
+        [conexao.gerar_id() for _ in range(len(df_agenda) - 2)]
+    planilha = benchmark.PlanilhaLocal({'Agenda': df_agenda})
+    google = conexao.ArmazenamentoGoogle(planilha, None)
+
+    df_raw = google.carregar_agenda()
+    df_novo = df_raw.copy()
+    df_novo.loc[df_novo.index[0], 'Executantes'] = "Ana 1"
+    google.salvar_agenda(df_novo, df_raw)
+
+    requisicoes = [r for corpo in planilha.requisicoes for r in corpo['requests']]
+    assert requisicoes and all('updateCells' in r for r in requisicoes)
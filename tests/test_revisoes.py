@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import conexao
+import revisoes
+
+
+def _montar(monkeypatch, origem, compartilhadas):
+    cargas = {nome: 0 for nome in origem}
+    def carregador(nome):
+        def carregar():
+            cargas[nome] += 1
+            return nome
+        return carregar
+    conjuntos = {nome: revisoes.ConjuntoVersionado(nome, carregador(nome)) for nome in origem}
+    monitor = revisoes.MonitorRevisoes(lambda: dict(origem), 20, ao_mudar=conexao._atualizar_mudancas,
+                                       compartilhadas=compartilhadas)
+    monkeypatch.setattr(conexao, "_conjuntos", lambda: conjuntos)
+    monkeypatch.setattr(conexao, "_monitor_revisoes", lambda: monitor)
+    for nome, conjunto in conjuntos.items():
+        conjunto.obter(monitor.atuais()[nome])
+    for nome in cargas:
+        cargas[nome] = 0
+    return conjuntos, cargas
+
+
+def test_gravacao_recarrega_so_o_conjunto_gravado(monkeypatch):
+    # Planilha Google: uma revisão para todas as abas
+    origem = {'agenda': 1, 'frota': 1, 'time': 1, 'arquivo': 1, 'obras': 7}
+    conjuntos, cargas = _montar(monkeypatch, origem, conexao.ArmazenamentoGoogle.REVISAO_COMPARTILHADA)
+
+    origem.update(agenda=2, frota=2, time=2, arquivo=2)
+    conexao.recarregar('agenda')
+
+    assert cargas == {'agenda': 1, 'frota': 0, 'time': 0, 'arquivo': 0, 'obras': 0}
+    # A revisão nova foi aceita: o próximo obter() não agenda recarga em segundo plano
+    assert all(conjuntos[nome]._revisao == 2 for nome in ('agenda', 'frota', 'time', 'arquivo'))
+
+
+def test_mudanca_externa_em_outro_conjunto_continua_recarregando(monkeypatch):
+    # SQLite: revisão por conjunto
+    origem = {'agenda': 1, 'frota': 1, 'time': 1, 'arquivo': 1, 'obras': 1}
+    conjuntos, cargas = _montar(monkeypatch, origem, ())
+
+    origem.update(agenda=2, frota=2)
+    conexao.recarregar('agenda')
+
+    assert cargas == {'agenda': 1, 'frota': 1, 'time': 0, 'arquivo': 0, 'obras': 0}